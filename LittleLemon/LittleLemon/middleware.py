@@ -0,0 +1,110 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from LittleLemonAPI.db import use_read_database
+from LittleLemonAPI.instrumentation import (
+    charge_stream,
+    finish_request,
+    install_sql_wrapper,
+    registry,
+    start_request,
+)
+
+
+def _install_on_new_connection(sender, connection, **kwargs):
+    install_sql_wrapper(connection)
+
+
+class RequestMetricsMiddleware:
+    """Record SQL count/time, serializer time and wall time for each request.
+
+    The figures are returned in a ``Server-Timing`` header and aggregated
+    per view in ``LittleLemonAPI.instrumentation.registry``. Place it first
+    in MIDDLEWARE so the total covers the rest of the stack.
+
+    Streaming responses are aggregated when their body is closed, so exports
+    and event streams count the SQL and time spent streaming; their header
+    can only report the work done before the first byte.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            install_sql_wrapper(connection)
+        connection_created.connect(_install_on_new_connection, dispatch_uid='littlelemon-metrics')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.record(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics, token = start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.record(request, response, metrics, start)
+
+    def record(self, request, response, metrics, start):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        duration = time.perf_counter() - start
+        if response.streaming:
+            charge_stream(response, metrics, lambda: registry.observe(
+                view, request.method, response.status_code, time.perf_counter() - start, metrics
+            ))
+        else:
+            registry.observe(view, request.method, response.status_code, duration, metrics)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.sql_time * 1000:.2f};desc="{metrics.sql_count} queries"',
+            f'serialize;dur={metrics.serializer_time * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}',
+        ])
+        return response
+
+
+class ReadReplicaMiddleware:
+    """Route the ORM reads of GET/HEAD requests to the read database.
+
+    Only takes effect with ``LittleLemonAPI.db.ReadReplicaRouter`` in
+    DATABASE_ROUTERS and ``LITTLELEMON_READ_DATABASE`` naming an alias.
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = use_read_database.set(request.method in self.safe_methods)
+        try:
+            return self.get_response(request)
+        finally:
+            use_read_database.reset(token)
+
+    async def __acall__(self, request):
+        token = use_read_database.set(request.method in self.safe_methods)
+        try:
+            return await self.get_response(request)
+        finally:
+            use_read_database.reset(token)
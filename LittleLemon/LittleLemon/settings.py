@@ -22,6 +22,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'LittleLemon.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +59,16 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'littlelemon',
+        # LocMemCache evicts least recently used entries past this size;
+        # the default of 300 is too small once every token is cached
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -85,24 +96,55 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # DRF Authentication settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'LittleLemonAPI.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'LittleLemonAPI.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'LittleLemonAPI.throttling.RoleRateThrottle',
+        'LittleLemonAPI.throttling.WriteScopeThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
-        'user': '1000/day'
+        'customer': '1000/day',
+        'delivery_crew': '5000/day',
+        'manager': '10000/day',
+        # Writes to views with a matching throttle_scope, on top of the role rate
+        'cart_write': '60/min',
+        'order_write': '20/min',
     }
 }
 
+# Seconds a user's group names are cached between requests (0 disables)
+LITTLELEMON_ROLE_CACHE_TTL = 30
+
+# Seconds a token -> user lookup stays cached (0 disables); entries are
+# dropped on logout, user save and group changes
+LITTLELEMON_TOKEN_CACHE_TTL = 60
+
+# Cache alias and TTL (seconds) for rendered menu item list pages
+LITTLELEMON_MENU_CACHE_ALIAS = 'default'
+LITTLELEMON_MENU_CACHE_TTL = 300
+
+# Delivery crew feed: longest long-poll wait, SSE heartbeat interval and
+# SSE stream lifetime before the client reconnects (seconds)
+LITTLELEMON_FEED_MAX_WAIT = 30
+LITTLELEMON_FEED_HEARTBEAT = 15
+LITTLELEMON_FEED_STREAM_MAX_AGE = 300
+
+# apply_retention: archive delivered orders older than this many days and
+# purge cart lines idle for this many days
+LITTLELEMON_ORDER_RETENTION_DAYS = 730
+LITTLELEMON_CART_IDLE_DAYS = 30
+
 # Djoser configuration
 DJOSER = {
     'USER_CREATE_PASSWORD_RETYPE': True,
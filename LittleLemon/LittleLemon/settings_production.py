@@ -0,0 +1,56 @@
+"""Production profile: ``DJANGO_SETTINGS_MODULE=LittleLemon.settings_production``.
+
+Builds on settings.py with persistent connections and a SQLite setup that
+lets cart and order writers queue on a busy timeout instead of failing
+with "database is locked". Set LITTLELEMON_READ_REPLICA=1 to also send the
+reads of GET requests to a second, query-only connection (or point
+LITTLELEMON_READ_DATABASE_NAME at a replica file).
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, MIDDLEWARE, SECRET_KEY
+
+DEBUG = False
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        # Keep connections (and their pragmas and page cache) across requests
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Seconds a writer waits for the lock before "database is locked"
+            'timeout': 20,
+            # Take the write lock at BEGIN: a deferred transaction that reads
+            # and then writes cannot wait for the lock and fails immediately
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+}
+
+# Applied to every new SQLite connection (LittleLemonAPI.db.apply_sqlite_pragmas)
+LITTLELEMON_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',          # readers no longer block the writer
+    'synchronous': 'normal',        # fsync at checkpoints only; safe with WAL
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,       # negative: KiB, i.e. 64 MiB per connection
+    'temp_store': 'memory',
+}
+
+if os.environ.get('LITTLELEMON_READ_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('LITTLELEMON_READ_DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {'timeout': 20},
+        'TEST': {'MIRROR': 'default'},
+    }
+    LITTLELEMON_READ_DATABASE = 'replica'
+    DATABASE_ROUTERS = ['LittleLemonAPI.db.ReadReplicaRouter']
+    MIDDLEWARE = [
+        MIDDLEWARE[0],
+        'LittleLemon.middleware.ReadReplicaMiddleware',
+        *MIDDLEWARE[1:],
+    ]
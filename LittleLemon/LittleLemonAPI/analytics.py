@@ -0,0 +1,278 @@
+"""Sales rollups maintained at order time, and the range queries over them."""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Count, Sum
+
+from .models import (
+    Order,
+    OrderItem,
+    DailySales,
+    CategoryDailySales,
+    MenuItemDailySales,
+)
+
+TOP_SELLERS = 10
+CENT = Decimal('0.01')
+
+_keep_deleted_orders = ContextVar('littlelemon_keep_deleted_orders', default=False)
+
+
+def record_order(date, lines):
+    """Add an order's ``(menuitem_id, category_id, quantity, price)`` lines to the rollups.
+
+    Each rollup row is incremented in the database (``INSERT ... ON
+    CONFLICT DO UPDATE``), so concurrent orders never lose updates. Run it
+    in the transaction that writes the order.
+    """
+    lines = list(lines)
+    if not lines:
+        return
+
+    menuitems, categories = {}, {}
+    for menuitem_id, category_id, quantity, price in lines:
+        for totals, key in [(menuitems, menuitem_id), (categories, category_id)]:
+            current_quantity, current_revenue = totals.get(key, (0, 0))
+            totals[key] = (current_quantity + quantity, current_revenue + price)
+    order_items = sum(quantity for quantity, _ in menuitems.values())
+    order_revenue = sum(revenue for _, revenue in menuitems.values())
+
+    _increment(DailySales, ['date'], [
+        (date, 1, order_items, order_revenue),
+    ], ['orders', 'items', 'revenue'])
+    _increment(CategoryDailySales, ['date', 'category'], [
+        (date, category_id, quantity, revenue)
+        for category_id, (quantity, revenue) in categories.items()
+    ], ['quantity', 'revenue'])
+    _increment(MenuItemDailySales, ['date', 'menuitem'], [
+        (date, menuitem_id, quantity, revenue)
+        for menuitem_id, (quantity, revenue) in menuitems.items()
+    ], ['quantity', 'revenue'])
+
+
+@contextmanager
+def keeping_deleted_orders():
+    """Delete orders inside the block without taking them out of the rollups.
+
+    For archiving, which moves orders out of the order tables while their
+    sales still count.
+    """
+    token = _keep_deleted_orders.set(True)
+    try:
+        yield
+    finally:
+        _keep_deleted_orders.reset(token)
+
+
+def keeps_deleted_orders():
+    return _keep_deleted_orders.get()
+
+
+def forget_orders(orders):
+    """Take ``orders``, about to be deleted, back out of the rollups.
+
+    Run for every deleted order (see signals.py). Revenue comes from the
+    order totals and items from the lines, as in ``rebuild_rollups``, so
+    the two always agree.
+    """
+    orders = orders.order_by()
+    lines = OrderItem.objects.filter(order__in=orders).order_by()
+    quantities = dict(
+        lines.values('order__date').annotate(items=Sum('quantity')).values_list('order__date', 'items')
+    )
+    daily = [
+        (row['date'], -row['orders'], -quantities.get(row['date'], 0), -row['revenue'])
+        for row in orders.values('date').annotate(orders=Count('id'), revenue=Sum('total'))
+    ]
+    _forget_lines(daily, lines)
+
+
+def forget_order_lines(lines):
+    """Take order lines, about to be deleted on their own, out of the rollups.
+
+    The orders and their totals stay, so only item counts move (e.g. the
+    lines of a deleted menu item).
+    """
+    lines = lines.order_by()
+    daily = [
+        (row['order__date'], 0, -row['items'], 0)
+        for row in lines.values('order__date').annotate(items=Sum('quantity'))
+    ]
+    _forget_lines(daily, lines)
+
+
+def _forget_lines(daily, lines):
+    per_category = [
+        (row['order__date'], row['menuitem__category'], -row['quantity'], -row['revenue'])
+        for row in lines.values('order__date', 'menuitem__category').annotate(
+            quantity=Sum('quantity'), revenue=Sum('price')
+        )
+    ]
+    per_menuitem = [
+        (row['order__date'], row['menuitem'], -row['quantity'], -row['revenue'])
+        for row in lines.values('order__date', 'menuitem').annotate(
+            quantity=Sum('quantity'), revenue=Sum('price')
+        )
+    ]
+    for model, key_fields, rows, sum_fields in [
+        (DailySales, ['date'], daily, ['orders', 'items', 'revenue']),
+        (CategoryDailySales, ['date', 'category'], per_category, ['quantity', 'revenue']),
+        (MenuItemDailySales, ['date', 'menuitem'], per_menuitem, ['quantity', 'revenue']),
+    ]:
+        if rows:
+            _increment(model, key_fields, rows, sum_fields)
+
+
+def _increment(model, key_fields, rows, sum_fields):
+    using = router.db_for_write(model)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in key_fields + sum_fields]
+    table, columns = qn(model._meta.db_table), [qn(field.column) for field in fields]
+    keys, sums = columns[:len(key_fields)], columns[len(key_fields):]
+
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(rows))
+    params = [
+        field.get_db_prep_save(value, connection)
+        for row in rows
+        for field, value in zip(fields, row)
+    ]
+    updates = ', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in sums)
+    sql = f"""
+        INSERT INTO {table} ({', '.join(columns)}) VALUES {placeholders}
+        ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def rebuild_rollups(start=None, end=None):
+    """Recompute the rollups for ``[start, end]`` (all history by default) from the order tables."""
+    orders = Order.objects.order_by()
+    items = OrderItem.objects.order_by()
+    rollups = [DailySales, CategoryDailySales, MenuItemDailySales]
+    if start:
+        orders, items = orders.filter(date__gte=start), items.filter(order__date__gte=start)
+    if end:
+        orders, items = orders.filter(date__lte=end), items.filter(order__date__lte=end)
+
+    with transaction.atomic():
+        for model in rollups:
+            stale = model.objects.all()
+            if start:
+                stale = stale.filter(date__gte=start)
+            if end:
+                stale = stale.filter(date__lte=end)
+            stale.delete()
+
+        quantities = dict(
+            items.values('order__date').annotate(items=Sum('quantity')).values_list('order__date', 'items')
+        )
+        DailySales.objects.bulk_create(
+            DailySales(
+                date=row['date'],
+                orders=row['orders'],
+                items=quantities.get(row['date'], 0),
+                revenue=row['revenue'],
+            )
+            for row in orders.values('date').annotate(orders=Count('id'), revenue=Sum('total'))
+        )
+        per_category = items.values('order__date', 'menuitem__category').annotate(
+            quantity=Sum('quantity'), revenue=Sum('price')
+        )
+        CategoryDailySales.objects.bulk_create(
+            (
+                CategoryDailySales(
+                    date=row['order__date'],
+                    category_id=row['menuitem__category'],
+                    quantity=row['quantity'],
+                    revenue=row['revenue'],
+                )
+                for row in per_category
+            ),
+            batch_size=1000,
+        )
+        per_menuitem = items.values('order__date', 'menuitem').annotate(
+            quantity=Sum('quantity'), revenue=Sum('price')
+        )
+        MenuItemDailySales.objects.bulk_create(
+            (
+                MenuItemDailySales(
+                    date=row['order__date'],
+                    menuitem_id=row['menuitem'],
+                    quantity=row['quantity'],
+                    revenue=row['revenue'],
+                )
+                for row in per_menuitem
+            ),
+            batch_size=1000,
+        )
+
+    return {model.__name__: model.objects.count() for model in rollups}
+
+
+def sales_summary(start=None, end=None):
+    """Revenue per day, category and menu item for ``[start, end]``, read from the rollups."""
+    def in_range(queryset):
+        if start:
+            queryset = queryset.filter(date__gte=start)
+        if end:
+            queryset = queryset.filter(date__lte=end)
+        return queryset
+
+    days = list(in_range(DailySales.objects.order_by('date')).values('date', 'orders', 'items', 'revenue'))
+    categories = list(
+        in_range(CategoryDailySales.objects.all())
+        .values('category_id', 'category__title')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'category_id')
+    )
+    menu_items = list(
+        in_range(MenuItemDailySales.objects.all())
+        .values('menuitem_id', 'menuitem__title')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'menuitem_id')
+    )
+
+    orders = sum(day['orders'] for day in days)
+    revenue = sum((day['revenue'] for day in days), Decimal(0))
+    for row in days:
+        row['revenue'] = _money(row['revenue'])
+
+    return {
+        'start': start,
+        'end': end,
+        'orders': orders,
+        'items': sum(day['items'] for day in days),
+        'revenue': _money(revenue),
+        'average_basket': _money(revenue / orders if orders else 0),
+        'days': days,
+        'categories': [
+            {
+                'id': row['category_id'],
+                'title': row['category__title'],
+                'quantity': row['quantity'],
+                'revenue': _money(row['revenue']),
+            }
+            for row in categories
+        ],
+        'menu_items': [
+            {
+                'id': row['menuitem_id'],
+                'title': row['menuitem__title'],
+                'quantity': row['quantity'],
+                'revenue': _money(row['revenue']),
+            }
+            for row in menu_items
+        ],
+        'top_sellers': [
+            {'id': row['menuitem_id'], 'title': row['menuitem__title'], 'quantity': row['quantity']}
+            for row in sorted(menu_items, key=lambda row: (-row['quantity'], row['menuitem_id']))[:TOP_SELLERS]
+        ],
+    }
+
+
+def _money(value):
+    return str(Decimal(value).quantize(CENT))
@@ -0,0 +1,283 @@
+"""ASGI-native read paths for the hottest GET endpoints.
+
+DRF views are synchronous, so under ASGI each request holds a worker
+thread for its whole lifetime. These views serve the same JSON as their
+DRF counterparts (menu items, cart, orders) using Django's async ORM, so
+one event loop can keep many browse requests in flight. They accept the
+same Token (or session) authentication, role rules and throttles (the
+same buckets as the DRF views); the browsable API is not offered here.
+
+The delivery crew feed (long-poll and Server-Sent Events) lives here too:
+idle drivers wait on the in-process notifier instead of re-querying.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import Throttled
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
+
+from .authentication import acache_token, aget_cached_token
+from .models import Cart, MenuItem, OrderStatus
+from .notifier import notifier
+from .read_serializers import read_serializer
+from .renderers import FastJSONRenderer
+from .roles import DELIVERY_CREW, aget_user_roles, is_customer, is_delivery_crew
+from .search import fts_available
+from .serializers import CartSerializer, MenuItemSerializer, OrderSerializer
+from .views import filter_menu_items, orders_for
+
+CartReadSerializer = read_serializer(CartSerializer)
+MenuItemReadSerializer = read_serializer(MenuItemSerializer)
+OrderReadSerializer = read_serializer(OrderSerializer)
+
+NOT_AUTHENTICATED = 'Authentication credentials were not provided.'
+PERMISSION_DENIED = 'You do not have permission to perform this action.'
+
+
+def json_response(data, status=200, headers=None):
+    # Same bytes as the DRF views' default renderer
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status, headers=headers, content_type='application/json'
+    )
+
+
+def error_response(detail, status):
+    headers = {'WWW-Authenticate': 'Token'} if status == 401 else None
+    return json_response({'detail': detail}, status=status, headers=headers)
+
+
+async def authenticate(request):
+    """Resolve the user from a ``Token`` header, falling back to the session."""
+    header = request.headers.get('Authorization', '').split()
+    if header and header[0].lower() == 'token':
+        if len(header) != 2:
+            return None
+        token = await aget_cached_token(header[1])
+        if token is not None:
+            return token.user
+        try:
+            token = await Token.objects.select_related('user').aget(key=header[1])
+        except Token.DoesNotExist:
+            return None
+        if not token.user.is_active:
+            return None
+        await acache_token(token)
+        return token.user
+
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def _throttle_waits(request, throttles):
+    # Every throttle is consulted, as in APIView.check_throttles
+    return [throttle.wait() for throttle in throttles if not throttle.allow_request(request, None)]
+
+
+async def check_throttles(request, user):
+    """Return a 429 response if a DRF throttle refuses ``user``, else None.
+
+    Called once the request is authenticated and permitted, like DRF does,
+    so refused requests do not use up the caller's rate.
+    """
+    request.user = user
+    # The DRF views' default (DEFAULT_THROTTLE_CLASSES), so both stay in step
+    throttles = [throttle() for throttle in APIView.throttle_classes]
+    waits = await sync_to_async(_throttle_waits)(request, throttles)
+    if not waits:
+        return None
+    exc = Throttled(max((wait for wait in waits if wait is not None), default=None))
+    headers = {'Retry-After': '%d' % exc.wait} if exc.wait is not None else None
+    return json_response({'detail': exc.detail}, status=429, headers=headers)
+
+
+async def paginate(request, queryset):
+    """Page-number pagination matching DRF's PageNumberPagination output."""
+    page_size = api_settings.PAGE_SIZE
+    count = await queryset.acount()
+    last_page = max(1, -(-count // page_size))
+    page = request.GET.get('page', 1)
+    if page in PageNumberPagination.last_page_strings:
+        page = last_page
+    try:
+        page = int(page)
+    except ValueError:
+        page = 0
+    if not 1 <= page <= last_page:
+        return None, None
+
+    offset = (page - 1) * page_size
+    rows = [row async for row in queryset[offset:offset + page_size]]
+    url = request.build_absolute_uri()
+    if page < last_page:
+        next_link = replace_query_param(url, 'page', page + 1)
+    else:
+        next_link = None
+    if page == 1:
+        previous_link = None
+    elif page == 2:
+        previous_link = remove_query_param(url, 'page')
+    else:
+        previous_link = replace_query_param(url, 'page', page - 1)
+    return rows, {'count': count, 'next': next_link, 'previous': previous_link}
+
+
+async def paginated_response(request, queryset, serializer_class):
+    rows, links = await paginate(request, queryset)
+    if rows is None:
+        return error_response('Invalid page.', 404)
+    return json_response({**links, 'results': serializer_class(rows, many=True).data})
+
+
+@require_GET
+async def menu_item_list(request):
+    user = await authenticate(request)
+    if user is None:
+        return error_response(NOT_AUTHENTICATED, 401)
+    if throttled := await check_throttles(request, user):
+        return throttled
+    if request.GET.get('search'):
+        # Introspects the schema once per process; keep it off the event loop
+        await sync_to_async(fts_available)(MenuItem.objects.db)
+    queryset = filter_menu_items(MenuItem.objects.all(), request.GET)
+    return await paginated_response(request, queryset, MenuItemReadSerializer)
+
+
+@require_GET
+async def menu_item_detail(request, pk):
+    user = await authenticate(request)
+    if user is None:
+        return error_response(NOT_AUTHENTICATED, 401)
+    if throttled := await check_throttles(request, user):
+        return throttled
+    try:
+        menuitem = await MenuItem.objects.select_related('category').aget(pk=pk)
+    except MenuItem.DoesNotExist:
+        return error_response('No MenuItem matches the given query.', 404)
+    return json_response(MenuItemReadSerializer(menuitem).data)
+
+
+@require_GET
+async def cart_list(request):
+    user = await authenticate(request)
+    if user is None:
+        return error_response(NOT_AUTHENTICATED, 401)
+    await aget_user_roles(user)
+    if not is_customer(user):
+        return error_response(PERMISSION_DENIED, 403)
+    if throttled := await check_throttles(request, user):
+        return throttled
+    cart_items = Cart.objects.filter(user=user).select_related('menuitem__category')
+    return json_response(CartReadSerializer([item async for item in cart_items], many=True).data)
+
+
+@require_GET
+async def order_list(request):
+    user = await authenticate(request)
+    if user is None:
+        return error_response(NOT_AUTHENTICATED, 401)
+    if throttled := await check_throttles(request, user):
+        return throttled
+    queryset = orders_for(user, await aget_user_roles(user))
+    return await paginated_response(request, queryset, OrderReadSerializer)
+
+
+async def crew_user(request):
+    """Return ``(user, None)`` for delivery crew, else ``(None, error response)``."""
+    user = await authenticate(request)
+    if user is None:
+        return None, error_response(NOT_AUTHENTICATED, 401)
+    await aget_user_roles(user)
+    if not is_delivery_crew(user):
+        return None, error_response(PERMISSION_DENIED, 403)
+    if throttled := await check_throttles(request, user):
+        return None, throttled
+    return user, None
+
+
+def crew_open_orders(user):
+    return orders_for(user, {DELIVERY_CREW}).filter(
+        status__lt=OrderStatus.DELIVERED
+    ).order_by('date', 'id')
+
+
+async def open_orders_payload(user):
+    # Read the cursor first: a change landing mid-query is then re-sent, never lost
+    cursor = notifier.cursor(user.pk)
+    queryset = crew_open_orders(user)
+    results = OrderReadSerializer([order async for order in queryset], many=True).data
+    return {'cursor': cursor, 'results': results}
+
+
+def feed_setting(name, default):
+    return getattr(settings, f'LITTLELEMON_FEED_{name}', default)
+
+
+@require_GET
+async def delivery_feed(request):
+    """Long-poll for the driver's open orders.
+
+    Without a current ``since`` cursor the open orders are returned at once.
+    With one, the request waits up to ``wait`` seconds for an assignment or
+    delivery touching this driver, without touching the database, and
+    answers 204 if nothing changed.
+    """
+    user, error = await crew_user(request)
+    if error:
+        return error
+    since = notifier.parse_cursor(request.GET.get('since'))
+    if since >= 0:
+        try:
+            wait = float(request.GET.get('wait', feed_setting('MAX_WAIT', 30)))
+        except ValueError:
+            wait = 0
+        wait = min(max(wait, 0), feed_setting('MAX_WAIT', 30))
+        if await notifier.wait(user.pk, since, wait) <= since:
+            return HttpResponse(status=204)
+    return json_response(await open_orders_payload(user))
+
+
+@require_GET
+async def delivery_events(request):
+    """Server-Sent Events stream of the driver's open orders (ASGI only).
+
+    An ``orders`` event carrying the full open-order list is sent on connect
+    (unless ``Last-Event-ID`` is still current) and after every change, with
+    comment heartbeats in between. The stream ends after
+    ``LITTLELEMON_FEED_STREAM_MAX_AGE`` seconds; EventSource reconnects with
+    ``Last-Event-ID`` so nothing is missed.
+    """
+    user, error = await crew_user(request)
+    if error:
+        return error
+    since = notifier.parse_cursor(
+        request.headers.get('Last-Event-ID') or request.GET.get('since')
+    )
+
+    async def events(since):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + feed_setting('STREAM_MAX_AGE', 300)
+        yield b'retry: 3000\n\n'
+        while True:
+            if since < 0 or notifier.version(user.pk) > since:
+                payload = await open_orders_payload(user)
+                since = notifier.parse_cursor(payload['cursor'])
+                data = FastJSONRenderer().render(payload['results'])
+                yield b'id: %s\nevent: orders\ndata: %s\n\n' % (payload['cursor'].encode(), data)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            timeout = min(feed_setting('HEARTBEAT', 15), remaining)
+            if await notifier.wait(user.pk, since, timeout) <= since:
+                yield b': keepalive\n\n'
+
+    response = StreamingHttpResponse(events(since), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
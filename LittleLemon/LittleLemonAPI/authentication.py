@@ -0,0 +1,79 @@
+"""Token authentication with the token -> user lookup cached between requests."""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .roles import aget_user_roles, get_user_roles, set_request_roles
+
+
+def _cache_key(key):
+    # Token keys are credentials: never use them verbatim as cache keys
+    return f'littlelemon:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def _cache_ttl():
+    return getattr(settings, 'LITTLELEMON_TOKEN_CACHE_TTL', 0)
+
+
+def _restore(entry):
+    # Each cache read unpickles fresh objects, so no state leaks between requests
+    token, roles = entry
+    set_request_roles(token.user, roles)
+    return token
+
+
+def get_cached_token(key):
+    """Return the cached Token (with its user and roles loaded) for ``key``, or None."""
+    if not _cache_ttl():
+        return None
+    entry = cache.get(_cache_key(key))
+    return None if entry is None else _restore(entry)
+
+
+async def aget_cached_token(key):
+    if not _cache_ttl():
+        return None
+    entry = await cache.aget(_cache_key(key))
+    return None if entry is None else _restore(entry)
+
+
+def cache_token(token):
+    ttl = _cache_ttl()
+    if ttl:
+        cache.set(_cache_key(token.key), (token, get_user_roles(token.user)), ttl)
+
+
+async def acache_token(token):
+    ttl = _cache_ttl()
+    if ttl:
+        await cache.aset(_cache_key(token.key), (token, await aget_user_roles(token.user)), ttl)
+
+
+def invalidate_tokens(*keys):
+    cache.delete_many([_cache_key(key) for key in keys])
+
+
+def invalidate_user_tokens(*user_ids):
+    invalidate_tokens(*Token.objects.filter(user_id__in=user_ids).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that keeps token -> user (and roles) in the cache.
+
+    Entries live for ``LITTLELEMON_TOKEN_CACHE_TTL`` seconds and are dropped
+    when the token is deleted (e.g. djoser logout), the user is deactivated
+    or changes password, or their groups change; see signals.py. Only valid tokens
+    of active users are cached.
+    """
+
+    def authenticate_credentials(self, key):
+        token = get_cached_token(key)
+        if token is not None:
+            return token.user, token
+
+        user, token = super().authenticate_credentials(key)
+        cache_token(token)
+        return user, token
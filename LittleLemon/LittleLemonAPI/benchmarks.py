@@ -0,0 +1,695 @@
+"""Benchmark scenarios for the LittleLemonAPI endpoints.
+
+Scenarios are run with ``python manage.py benchmark`` against a throwaway
+test database, so the configured database is never touched. Each scenario
+yields result rows with p50/p99 latency, queries and peak allocations per
+call; the command can store them as a baseline and compare later runs.
+"""
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import OperationalError, connection, connections
+from django.test import AsyncClient, Client, RequestFactory, override_settings
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.throttling import SimpleRateThrottle, UserRateThrottle
+from rest_framework.views import APIView
+
+from .analytics import rebuild_rollups, record_order
+from .catalog import clear_catalog_map
+from .dispatch import assign_open_orders
+from .models import Category, MenuItem, Cart, Order, OrderItem, OrderStatus
+from .read_serializers import read_serializer
+from .renderers import FastJSONRenderer
+from .roles import MANAGER, DELIVERY_CREW
+from .serializers import CartSerializer, MenuItemSerializer, OrderSerializer
+from .throttling import RoleRateThrottle
+from .views import orders_for
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Register ``func(options)`` as a scenario yielding result rows."""
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+@contextmanager
+def isolated_database():
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        # SQLite keeps an in-memory test database across create/destroy (its
+        # connection is never closed), so empty it for every scenario, along
+        # with state cached from the previous one's rows
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        clear_catalog_map()
+        # Throttling would reject repeated requests long before a run ends
+        with mock.patch.object(APIView, 'throttle_classes', []), warnings.catch_warnings():
+            warnings.simplefilter('ignore', UnorderedObjectListWarning)
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(func, repeat, setup=None):
+    """Call ``func`` ``repeat`` times and summarize latency, queries and memory.
+
+    ``setup`` runs untimed before every call. Queries are the per-call
+    median so one-off cache misses do not count. Peak allocations are taken
+    from one extra call under tracemalloc so tracing does not skew timings.
+    """
+    timings = []
+    queries = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(context.captured_queries))
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': percentile(timings, 0.5),
+        'p99_ms': percentile(timings, 0.99),
+        'queries': percentile(queries, 0.5),
+        'alloc_kib': peak / 1024,
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """Compare result rows against a stored baseline.
+
+    A case regresses when it issues more queries than before or its p50
+    latency grows by more than ``tolerance`` (a fraction).
+    """
+    found = []
+    for name, cases in results.items():
+        for case, row in cases.items():
+            before = baseline.get(name, {}).get(case)
+            if before is None:
+                continue
+            if row['queries'] > before['queries']:
+                found.append(f"{name} / {case}: queries {before['queries']:.1f} -> {row['queries']:.1f}")
+            if row['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+                found.append(f"{name} / {case}: p50 {before['p50_ms']:.2f} -> {row['p50_ms']:.2f} ms")
+    return found
+
+
+def load_baseline(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+
+
+def api_client(user):
+    """Return a client authenticating with a real token, like API clients do."""
+    token, _ = Token.objects.get_or_create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+DISHES = ['Greek Salad', 'Lemon Chicken', 'Bruschetta', 'Lemon Dessert', 'Pasta', 'Grilled Fish']
+
+
+def create_menu(count, categories=5, start=0):
+    category_objs = list(Category.objects.all()[:categories])
+    if not category_objs:
+        category_objs = Category.objects.bulk_create(
+            Category(slug=f'category-{i}', title=f'Category {i}')
+            for i in range(categories)
+        )
+    return MenuItem.objects.bulk_create(
+        MenuItem(
+            title=f'{DISHES[i % len(DISHES)]} {i}',
+            price=Decimal(5 + i % 20) + Decimal('0.50'),
+            featured=i % 10 == 0,
+            category=category_objs[i % len(category_objs)],
+        )
+        for i in range(start, start + count)
+    )
+
+
+def check_status(response, expected):
+    if response.status_code != expected:
+        raise AssertionError(
+            f'{response.wsgi_request.path} returned {response.status_code}, expected {expected}'
+        )
+
+
+@scenario('order-create')
+def order_create(options):
+    """Latency of POST /api/orders/ against the number of cart lines."""
+    customer = User.objects.create_user(username='bench-customer')
+    client = api_client(customer)
+    menu = create_menu(max(options['cart_sizes']))
+
+    for size in options['cart_sizes']:
+        def fill_cart():
+            Cart.objects.bulk_create(
+                Cart(
+                    user=customer,
+                    menuitem=menuitem,
+                    quantity=2,
+                    unit_price=menuitem.price,
+                    price=menuitem.price * 2,
+                )
+                for menuitem in menu[:size]
+            )
+
+        def place_order():
+            check_status(client.post('/api/orders/'), 201)
+
+        yield {'case': f'{size} cart lines', **measure(place_order, options['repeat'], fill_cart)}
+
+
+@scenario('menu-search')
+def menu_search(options):
+    """Latency of GET /api/menu-items/?search= as the menu grows."""
+    customer = User.objects.create_user(username='bench-customer')
+    client = api_client(customer)
+    created = 0
+
+    for size in options['menu_sizes']:
+        create_menu(size - created, start=created)
+        created = size
+
+        for text in ['lemon', 'grilled fish 1', 'zz']:
+            def search():
+                # Bypass the list cache so every call hits the database
+                cache.clear()
+                check_status(client.get('/api/menu-items/', {'search': text}), 200)
+
+            yield {'case': f'{size} items, {text!r}', **measure(search, options['repeat'])}
+
+
+def seed_dataset(scale=1, seed=0):
+    """Bulk-load a synthetic restaurant: menu, users in every role, carts and orders.
+
+    Returns the users and menu needed to drive the endpoints.
+    """
+    rng = random.Random(seed)
+    menu = create_menu(200 * scale, categories=8)
+
+    manager_group, _ = Group.objects.get_or_create(name=MANAGER)
+    crew_group, _ = Group.objects.get_or_create(name=DELIVERY_CREW)
+    users = User.objects.bulk_create(
+        [User(username=f'bench-manager-{i}') for i in range(2)]
+        + [User(username=f'bench-crew-{i}') for i in range(5 * scale)]
+        + [User(username=f'bench-customer-{i}') for i in range(50 * scale)]
+    )
+    managers, crew, customers = users[:2], users[2:2 + 5 * scale], users[2 + 5 * scale:]
+    manager_group.user_set.add(*managers)
+    crew_group.user_set.add(*crew)
+
+    carts = []
+    for customer in customers[::2]:
+        for menuitem in rng.sample(menu, 3):
+            carts.append(Cart(
+                user=customer, menuitem=menuitem, quantity=1,
+                unit_price=menuitem.price, price=menuitem.price,
+            ))
+    Cart.objects.bulk_create(carts)
+
+    orders = Order.objects.bulk_create(
+        Order(
+            user=rng.choice(customers),
+            delivery_crew=rng.choice(crew) if i % 3 else None,
+            status=OrderStatus.values[i % 4],
+            total=0,
+        )
+        for i in range(2000 * scale)
+    )
+    # auto_now_add cannot be overridden through bulk_create; spread the
+    # history over a year afterwards so date filters and ordering matter
+    today = date.today()
+    for offset in range(365):
+        Order.objects.filter(id__in=[order.id for order in orders[offset::365]]).update(
+            date=today - timedelta(days=offset)
+        )
+
+    items = []
+    for order in orders:
+        for menuitem in rng.sample(menu, 3):
+            items.append(OrderItem(
+                order=order, menuitem=menuitem, quantity=1, price=menuitem.price,
+            ))
+    OrderItem.objects.bulk_create(items, batch_size=5000)
+
+    return {
+        'menu': menu,
+        'manager': managers[0],
+        'crew': crew[0],
+        'customer': customers[0],
+        'orders': orders,
+    }
+
+
+@scenario('endpoints')
+def endpoints(options):
+    """Drive every LittleLemonAPI endpoint against a seeded dataset."""
+    data = seed_dataset(options['scale'])
+    rebuild_rollups()
+    manager = api_client(data['manager'])
+    crew = api_client(data['crew'])
+    customer = api_client(data['customer'])
+    menuitem = data['menu'][0]
+    customer_order = Order.objects.filter(user=data['customer']).first()
+    crew_order = Order.objects.filter(delivery_crew=data['crew']).first()
+    rush = list(Order.objects.order_by('id').values_list('id', flat=True)[:100])
+    unassigned = list(Order.objects.filter(delivery_crew=None).values_list('id', flat=True))
+    spare = User.objects.create(username='bench-spare')
+    crew_group = Group.objects.get(name=DELIVERY_CREW)
+
+    # Rows the write cases change or delete; each setup puts them back
+    scratch_category = Category.objects.create(slug='bench-scratch', title='Scratch')
+    empty_category = Category.objects.create(slug='bench-empty', title='Empty')
+    scratch_item = MenuItem.objects.create(
+        title='Scratch Item', price=Decimal('9.50'), category=scratch_category
+    )
+    scratch_order = Order(user=data['customer'], total=menuitem.price)
+
+    def fill_cart():
+        Cart.objects.get_or_create(
+            user=data['customer'], menuitem=menuitem,
+            defaults={'quantity': 1, 'unit_price': menuitem.price, 'price': menuitem.price},
+        )
+
+    def reopen_rush():
+        Order.objects.filter(pk__in=rush).update(status=OrderStatus.PLACED)
+
+    def unassign():
+        Order.objects.filter(pk__in=unassigned).update(delivery_crew=None)
+
+    def restore_scratch():
+        scratch_category.save()
+        scratch_item.save()
+
+    def restore_scratch_order():
+        scratch_order.save()
+        _, created = OrderItem.objects.get_or_create(
+            order=scratch_order, menuitem=menuitem,
+            defaults={'quantity': 1, 'price': menuitem.price},
+        )
+        if created:
+            # As placing it would; deleting it takes the line back out
+            record_order(scratch_order.date, [(menuitem.id, menuitem.category_id, 1, menuitem.price)])
+
+    restore_scratch_order()
+
+    def drop_new_category():
+        Category.objects.filter(slug='bench-new').delete()
+
+    item_body = {
+        'title': 'Scratch Item', 'price': '9.50', 'featured': False,
+        'category_id': scratch_category.id,
+    }
+    new_item_body = {**item_body, 'title': 'New Item', 'category_id': menuitem.category_id}
+    import_body = f'id,title,price,featured,category\n{scratch_item.id},Scratch Item,9.50,false,bench-scratch\n'
+    today = date.today()
+    month = f'?start={today - timedelta(days=30)}&end={today}'
+
+    # (case, client, method, path, request kwargs, setup, expected status)
+    cases = [
+        ('GET menu-items', customer, 'get', '/api/menu-items/', {}, None, 200),
+        ('GET menu-items?category', customer, 'get', '/api/menu-items/?category=category-1', {}, None, 200),
+        ('GET menu-items?sort', customer, 'get', '/api/menu-items/?sort=-price&page=3', {}, None, 200),
+        ('GET menu-items?search', customer, 'get', '/api/menu-items/?search=lemon', {}, None, 200),
+        ('GET menu-items keyset', customer, 'get', '/api/menu-items/?pagination=keyset', {}, None, 200),
+        ('GET menu-items/<id>', customer, 'get', f'/api/menu-items/{menuitem.id}/', {}, None, 200),
+        ('POST menu-items', manager, 'post', '/api/menu-items/', {'data': new_item_body}, None, 201),
+        ('PUT menu-items/<id>', manager, 'put', f'/api/menu-items/{scratch_item.id}/',
+         {'data': item_body}, restore_scratch, 200),
+        ('PATCH menu-items/<id>', manager, 'patch', f'/api/menu-items/{scratch_item.id}/',
+         {'data': {'featured': True}}, restore_scratch, 200),
+        ('DELETE menu-items/<id>', manager, 'delete', f'/api/menu-items/{scratch_item.id}/',
+         {}, restore_scratch, 204),
+        ('GET menu-items/cache-stats', manager, 'get', '/api/menu-items/cache-stats/', {}, None, 200),
+        ('GET menu-items/export csv', manager, 'get', '/api/menu-items/export/?format=csv', {}, None, 200),
+        ('POST menu-items/import', manager, 'post', '/api/menu-items/import/',
+         {'data': import_body, 'content_type': 'text/csv'}, restore_scratch, 200),
+        ('GET menu/snapshot', customer, 'get', '/api/menu/snapshot', {}, None, 200),
+        ('GET categories', manager, 'get', '/api/categories/', {}, None, 200),
+        ('POST categories', manager, 'post', '/api/categories/',
+         {'data': {'slug': 'bench-new', 'title': 'New'}}, drop_new_category, 201),
+        ('PUT categories/<id>', manager, 'put', f'/api/categories/{scratch_category.id}/',
+         {'data': {'slug': 'bench-scratch', 'title': 'Renamed'}}, restore_scratch, 200),
+        ('PATCH categories/<id>', manager, 'patch', f'/api/categories/{scratch_category.id}/',
+         {'data': {'title': 'Renamed'}}, restore_scratch, 200),
+        ('DELETE categories/<id>', manager, 'delete', f'/api/categories/{empty_category.id}/',
+         {}, empty_category.save, 204),
+        ('GET cart', customer, 'get', '/api/cart/', {}, None, 200),
+        ('POST cart', customer, 'post', '/api/cart/',
+         {'data': {'menuitem_id': menuitem.id, 'quantity': 1}}, None, 201),
+        ('DELETE cart', customer, 'delete', '/api/cart/', {}, fill_cart, 204),
+        ('GET orders (customer)', customer, 'get', '/api/orders/', {}, None, 200),
+        ('GET orders (crew)', crew, 'get', '/api/orders/', {}, None, 200),
+        ('GET orders (manager)', manager, 'get', '/api/orders/?page=50', {}, None, 200),
+        ('GET orders keyset (manager)', manager, 'get', '/api/orders/?pagination=keyset', {}, None, 200),
+        ('GET orders/<id>', customer, 'get', f'/api/orders/{customer_order.id}/', {}, None, 200),
+        ('POST orders', customer, 'post', '/api/orders/', {}, fill_cart, 201),
+        ('PATCH orders/<id>', manager, 'patch', f'/api/orders/{crew_order.id}/',
+         {'data': {'delivery_crew': data['crew'].id}}, None, 200),
+        ('DELETE orders/<id>', manager, 'delete', f'/api/orders/{scratch_order.id}/', {}, restore_scratch_order, 204),
+        ('PATCH orders/<id>/deliver', crew, 'patch', f'/api/orders/{crew_order.id}/deliver/', {}, None, 200),
+        ('POST orders/transition (100)', manager, 'post', '/api/orders/transition/',
+         {'data': {'ids': rush, 'status': OrderStatus.PREPARING}, 'format': 'json'}, reopen_rush, 200),
+        ('POST orders/assign (100)', manager, 'post', '/api/orders/assign/',
+         {'data': {'limit': 100}}, unassign, 200),
+        ('GET orders/export csv', manager, 'get', f'/api/orders/export/{month}&format=csv', {}, None, 200),
+        ('GET analytics/sales', manager, 'get', f'/api/analytics/sales{month}', {}, None, 200),
+        ('GET metrics', manager, 'get', '/api/metrics', {}, None, 200),
+        ('GET groups/manager/users', manager, 'get', '/api/groups/manager/users', {}, None, 200),
+        ('GET groups/delivery-crew/users', manager, 'get', '/api/groups/delivery-crew/users', {}, None, 200),
+        ('POST groups/delivery-crew/users', manager, 'post', '/api/groups/delivery-crew/users',
+         {'data': {'username': spare.username}}, None, 201),
+        ('DELETE groups/delivery-crew/<id>', manager, 'delete',
+         f'/api/groups/delivery-crew/users/{spare.id}', {}, lambda: crew_group.user_set.add(spare), 200),
+    ]
+    for case, client, method, path, kwargs, setup, expected in cases:
+        def call():
+            response = getattr(client, method)(path, **kwargs)
+            check_status(response, expected)
+            if response.streaming:
+                # Exports do their work while the body is read
+                for _ in response.streaming_content:
+                    pass
+
+        yield {'case': case, **measure(call, options['repeat'], setup)}
+
+
+@scenario('asgi-vs-wsgi')
+def asgi_vs_wsgi(options):
+    """Throughput of order listing: DRF views on threads vs async views on one loop."""
+    data = seed_dataset(1)
+    token = Token.objects.create(user=data['customer']).key
+    headers = {'Authorization': f'Token {token}'}
+    # Batches are expensive; a handful is enough for a stable median
+    repeat = max(3, options['repeat'] // 5)
+
+    for concurrency in options['concurrency']:
+        total = concurrency * 8
+
+        def wsgi_request(_):
+            check_status(Client().get('/api/orders/', headers=headers), 200)
+
+        def wsgi_batch():
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(wsgi_request, range(total)))
+
+        async def asgi_requests():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def asgi_request():
+                async with semaphore:
+                    check_status(await client.get('/api/async/orders/', headers=headers), 200)
+
+            await asyncio.gather(*(asgi_request() for _ in range(total)))
+
+        def asgi_batch():
+            asyncio.run(asgi_requests())
+
+        for label, batch in [('WSGI', wsgi_batch), ('ASGI', asgi_batch)]:
+            row = measure(batch, repeat)
+            row['rps'] = total / (row['p50_ms'] / 1000)
+            yield {'case': f'{label} x{concurrency} ({total} requests)', **row}
+
+
+@scenario('order-export')
+def order_export(options):
+    """Throughput of the streamed order history export."""
+    data = seed_dataset(options['scale'])
+    client = api_client(data['manager'])
+    rows = OrderItem.objects.count()
+
+    for fmt in ['csv', 'ndjson']:
+        def export():
+            response = client.get('/api/orders/export/', {'format': fmt})
+            check_status(response, 200)
+            for _ in response.streaming_content:
+                pass
+
+        row = measure(export, max(3, options['repeat'] // 5))
+        row['rows_per_s'] = rows / (row['p50_ms'] / 1000)
+        yield {'case': f'{fmt}, {rows} lines', **row}
+
+
+@scenario('sales-analytics')
+def sales_analytics(options):
+    """Latency of GET /api/analytics/sales over growing date ranges."""
+    data = seed_dataset(options['scale'])
+    rebuild_rollups()
+    client = api_client(data['manager'])
+    today = date.today()
+
+    for days in [1, 30, 365]:
+        params = {'start': today - timedelta(days=days - 1), 'end': today}
+
+        def summary():
+            check_status(client.get('/api/analytics/sales', params), 200)
+
+        yield {'case': f'{days} day(s)', **measure(summary, options['repeat'])}
+
+
+@scenario('read-serializers')
+def read_serializers(options):
+    """DRF serializer + JSONRenderer vs compiled read plan + FastJSONRenderer on 1,000-row pages."""
+    menu = create_menu(1000)
+    customer = User.objects.create_user(username='bench-customer')
+    Cart.objects.bulk_create(
+        Cart(user=customer, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+        for item in menu
+    )
+    orders = Order.objects.bulk_create(Order(user=customer, total=0) for _ in range(1000))
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, menuitem=item, quantity=1, price=item.price)
+        for i, order in enumerate(orders)
+        for item in menu[i % 997:i % 997 + 3]
+    )
+
+    pages = [
+        ('menu items', MenuItemSerializer, MenuItem.objects.select_related('category').order_by('id')),
+        ('cart lines', CartSerializer, Cart.objects.select_related('menuitem__category').order_by('id')),
+        ('orders', OrderSerializer, orders_for(customer, set()).order_by('id')),
+    ]
+    for label, serializer_class, queryset in pages:
+        rows = list(queryset)
+        plan_class = read_serializer(serializer_class)
+
+        def drf():
+            return JSONRenderer().render(serializer_class(rows, many=True).data)
+
+        def plan():
+            return FastJSONRenderer().render(plan_class(rows, many=True).data)
+
+        if drf() != plan():
+            raise AssertionError(f'{label}: read plan output differs from the DRF serializer')
+        yield {'case': f'{label}, DRF', **measure(drf, options['repeat'])}
+        yield {'case': f'{label}, plan', **measure(plan, options['repeat'])}
+
+    client = api_client(customer)
+
+    def cart_endpoint():
+        check_status(client.get('/api/cart/'), 200)
+
+    yield {'case': 'GET /api/cart/ (1,000 lines)', **measure(cart_endpoint, options['repeat'])}
+
+
+@scenario('menu-snapshot')
+def menu_snapshot(options):
+    """A home screen from one list call per category vs the prebuilt menu snapshot."""
+    create_menu(200, categories=8)
+    client = api_client(User.objects.create_user(username='bench-customer'))
+    slugs = list(Category.objects.order_by('id').values_list('slug', flat=True))
+
+    def per_category():
+        for slug in slugs:
+            check_status(client.get('/api/menu-items/', {'category': slug}), 200)
+
+    def snapshot():
+        check_status(client.get('/api/menu/snapshot'), 200)
+
+    for label, cold in [('cold', cache.clear), ('warm', None)]:
+        yield {'case': f'{len(slugs)} category lists, {label}', **measure(per_category, options['repeat'], cold)}
+        yield {'case': f'snapshot, {label}', **measure(snapshot, options['repeat'], cold)}
+
+
+@scenario('dispatch')
+def dispatch(options):
+    """Assigning 10k+ unassigned open orders across a dozen drivers."""
+    customer = User.objects.create_user(username='bench-customer')
+    crew_group, _ = Group.objects.get_or_create(name=DELIVERY_CREW)
+    crew_group.user_set.add(*User.objects.bulk_create(
+        User(username=f'bench-crew-{i}') for i in range(12)
+    ))
+    Order.objects.bulk_create(
+        (Order(user=customer, total=0) for _ in range(10000 * options['scale'])), batch_size=5000
+    )
+
+    def unassign():
+        Order.objects.update(delivery_crew=None)
+
+    for batch_size in [100, 500, 2000]:
+        def run():
+            assign_open_orders(batch_size=batch_size)
+
+        row = measure(run, max(3, options['repeat'] // 5), setup=unassign)
+        yield {'case': f'{Order.objects.count()} orders, batch {batch_size}', **row}
+
+
+@scenario('throttle')
+def throttle(options):
+    """DRF's UserRateThrottle vs the token-bucket RoleRateThrottle at 1000/day, by requests already made."""
+    request = RequestFactory().get('/api/menu-items/')
+    request.user = User.objects.create_user(username='bench-customer')
+    rates = {'user': '1000/day', 'customer': '1000/day'}
+
+    with mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', rates):
+        for used in [10, 500, 999]:
+            now = time.time()
+            cases = [
+                ('DRF', UserRateThrottle(), [now - i for i in range(used)]),
+                ('bucket', RoleRateThrottle(), (1000 - used, now)),
+            ]
+            for label, throttle, state in cases:
+                # Resolves the throttle's cache key
+                throttle.allow_request(request, None)
+
+                def reset():
+                    # Start every call from the same point in the window
+                    cache.set(throttle.key, state, 86400)
+
+                def check():
+                    if not throttle.allow_request(request, None):
+                        raise AssertionError(f'{label} throttle rejected request {used + 1}')
+
+                yield {'case': f'{used} used, {label}', **measure(check, options['repeat'] * 10, reset)}
+
+
+@contextmanager
+def file_database(path, overrides, pragmas):
+    """Point new ``default`` connections at the SQLite file ``path``.
+
+    Only connections opened afterwards (i.e. in worker threads) see it; the
+    main thread keeps its in-memory test database.
+    """
+    settings_dict = connections['default'].settings_dict
+    saved = dict(settings_dict)
+    settings_dict.update(NAME=path, **overrides)
+    try:
+        with override_settings(LITTLELEMON_SQLITE_PRAGMAS=pragmas):
+            yield
+    finally:
+        settings_dict.clear()
+        settings_dict.update(saved)
+
+
+@scenario('write-throughput')
+def write_throughput(options):
+    """Concurrent cart adds and checkouts against a SQLite file: default vs production profile."""
+    from LittleLemon import settings_production
+
+    data = seed_dataset(1)
+    customers = list(User.objects.filter(username__startswith='bench-customer-')[:max(options['concurrency'])])
+    clients = [api_client(customer) for customer in customers]
+    menuitem_ids = [item.id for item in data['menu']]
+    production = settings_production.DATABASES['default']
+    profiles = [
+        ('default', {'CONN_MAX_AGE': 0, 'OPTIONS': {}}, {}),
+        ('production', {
+            'CONN_MAX_AGE': production['CONN_MAX_AGE'],
+            'CONN_HEALTH_CHECKS': production['CONN_HEALTH_CHECKS'],
+            'OPTIONS': production['OPTIONS'],
+        }, settings_production.LITTLELEMON_SQLITE_PRAGMAS),
+    ]
+    iterations = 5
+    repeat = max(3, options['repeat'] // 5)
+
+    def writer(client, outcomes):
+        try:
+            for i in range(iterations):
+                try:
+                    check_status(client.post(
+                        '/api/cart/', {'menuitem_id': menuitem_ids[i], 'quantity': 1}, format='json'
+                    ), 201)
+                    outcomes.append('ok')
+                    check_status(client.post('/api/orders/'), 201)
+                    outcomes.append('ok')
+                except OperationalError:
+                    # "database is locked"; the rest of this iteration is lost
+                    outcomes.append('locked')
+        finally:
+            connections.close_all()
+
+    connection.ensure_connection()
+    with tempfile.TemporaryDirectory() as directory:
+        for label, overrides, pragmas in profiles:
+            path = os.path.join(directory, f'{label}.sqlite3')
+            target = sqlite3.connect(path)
+            connection.connection.backup(target)
+            target.close()
+
+            with file_database(path, overrides, pragmas):
+                for concurrency in options['concurrency']:
+                    outcomes = []
+
+                    def batch():
+                        outcomes.clear()
+                        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                            list(pool.map(writer, clients[:concurrency], [outcomes] * concurrency))
+
+                    row = measure(batch, repeat)
+                    # Only writes that committed count towards throughput
+                    row['rps'] = outcomes.count('ok') / (row['p50_ms'] / 1000)
+                    row['errors'] = outcomes.count('locked')
+                    total = concurrency * iterations * 2
+                    yield {'case': f'{label} x{concurrency} ({total} writes)', **row}
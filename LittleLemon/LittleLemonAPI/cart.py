@@ -0,0 +1,129 @@
+from django.db import connections, router
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+
+from .catalog import CATALOG_VERSION_ID, get_catalog_map, load_catalog_map
+from .models import Cart, CatalogVersion
+from .serializers import CartSerializer
+
+# Cart.price as CartSerializer renders it
+_price_field = CartSerializer().fields['price']
+
+
+def merge_cart_lines(lines):
+    """Sum the quantities of lines for the same menu item, keeping first-seen order."""
+    merged = {}
+    for line in lines:
+        menuitem_id = line['menuitem_id']
+        merged[menuitem_id] = merged.get(menuitem_id, 0) + line['quantity']
+    return merged
+
+
+def cart_line(entry, quantity, price):
+    """A cart line as CartSerializer renders it, from a catalog map entry."""
+    return {
+        'menuitem': entry.data,
+        'quantity': quantity,
+        'price': _price_field.to_representation(price),
+    }
+
+
+def cart_rows(user):
+    return Cart.objects.filter(user=user).annotate(
+        catalog_version=Coalesce(
+            CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values('version'), Value(0)
+        )
+    ).values_list('menuitem_id', 'quantity', 'price', 'catalog_version')
+
+
+def cart_lines(user):
+    """Return ``user``'s cart as CartSerializer data in a single query.
+
+    The catalog version rides along with the cart rows, so the menu item
+    details come from the in-process catalog map without going stale.
+    """
+    rows = list(cart_rows(user))
+    if not rows:
+        return []
+
+    items = get_catalog_map(rows[0][3]).items
+    if any(row[0] not in items for row in rows):
+        # Added to the menu (and the cart) since the map was built
+        items = load_catalog_map().items
+    return [cart_line(items[menuitem_id], quantity, price) for menuitem_id, quantity, price, _ in rows]
+
+
+def _upsert_sql(connection, count):
+    qn = connection.ops.quote_name
+    cart, version = qn(Cart._meta.db_table), qn(CatalogVersion._meta.db_table)
+    lines_sql = ' UNION ALL '.join(
+        ['SELECT %s AS menuitem_id, %s AS quantity, CAST(%s AS DECIMAL) AS unit_price'] * count
+    )
+    returning = ' RETURNING menuitem_id, quantity' if connection.features.can_return_rows_from_bulk_insert else ''
+    return f"""
+        INSERT INTO {cart} (user_id, menuitem_id, quantity, unit_price, price, updated)
+        SELECT %s, line.menuitem_id, line.quantity, line.unit_price, line.unit_price * line.quantity, %s
+        FROM ({lines_sql}) line
+        WHERE (SELECT COALESCE(MAX(version), 0) FROM {version} WHERE id = {CATALOG_VERSION_ID}) = %s
+        ON CONFLICT (menuitem_id, user_id) DO UPDATE SET
+            quantity = {cart}.quantity + excluded.quantity,
+            unit_price = excluded.unit_price,
+            price = excluded.unit_price * ({cart}.quantity + excluded.quantity),
+            updated = excluded.updated
+    """ + returning
+
+
+def upsert_cart_lines(user, quantities):
+    """Add ``{menuitem_id: quantity}`` to ``user``'s cart in one statement.
+
+    New lines are inserted at the current menu price, read from the
+    in-process catalog map; existing lines have their quantity incremented
+    in the database (``INSERT ... ON CONFLICT DO UPDATE``), so concurrent
+    adds never lose updates. The statement only writes if the catalog is
+    still at the map's version, otherwise the map is rebuilt and the add
+    retried. Returns the resulting lines as CartSerializer data, in the
+    order of ``quantities``. Raises NotFound, and should be run in a
+    transaction, if any menu item does not exist.
+    """
+    using = router.db_for_write(Cart)
+    connection = connections[using]
+    sql = _upsert_sql(connection, len(quantities))
+    # Raw SQL skips auto_now, so stamp the lines the way Cart.save() would
+    updated = Cart._meta.get_field('updated').get_db_prep_save(timezone.now(), connection)
+
+    catalog_map, fresh = get_catalog_map(), False
+    while True:
+        if not fresh and any(menuitem_id not in catalog_map.items for menuitem_id in quantities):
+            catalog_map, fresh = load_catalog_map(), True
+        try:
+            params = [
+                value
+                for menuitem_id, quantity in quantities.items()
+                for value in (menuitem_id, quantity, catalog_map.items[menuitem_id].price)
+            ]
+        except KeyError:
+            raise NotFound('No MenuItem matches the given query.')
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, updated, *params, catalog_map.version])
+            if connection.features.can_return_rows_from_bulk_insert:
+                totals = dict(cursor.fetchall())
+                written = len(totals)
+            else:
+                written = cursor.rowcount
+        if written:
+            break
+        # The catalog changed since the map was built
+        catalog_map, fresh = load_catalog_map(), True
+
+    if not connection.features.can_return_rows_from_bulk_insert:
+        totals = dict(Cart.objects.using(using).filter(
+            user=user, menuitem_id__in=quantities
+        ).values_list('menuitem_id', 'quantity'))
+    lines = []
+    for menuitem_id in quantities:
+        entry, quantity = catalog_map.items[menuitem_id], totals[menuitem_id]
+        lines.append(cart_line(entry, quantity, entry.price * quantity))
+    return lines
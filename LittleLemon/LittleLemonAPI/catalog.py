@@ -0,0 +1,243 @@
+import hashlib
+import threading
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .models import Category, CatalogVersion, MenuItem
+from .read_serializers import read_serializer
+from .renderers import FastJSONRenderer
+from .serializers import CategorySerializer, MenuItemSerializer
+
+# Primary key of the single CatalogVersion row
+CATALOG_VERSION_ID = 1
+
+
+def get_catalog_version():
+    """Return ``(version, updated)`` for the menu catalog in one query.
+
+    ``updated`` is None until the catalog has been changed at least once.
+    """
+    row = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list(
+        'version', 'updated'
+    ).first()
+    return row or (0, None)
+
+
+def bump_catalog_version():
+    now = timezone.now()
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(
+        version=F('version') + 1, updated=now
+    )
+    if not updated:
+        CatalogVersion.objects.create(pk=CATALOG_VERSION_ID, version=1, updated=now)
+    # Other processes notice the new version; this one need not wait for it
+    clear_catalog_map()
+
+
+class CatalogEntry(NamedTuple):
+    price: object
+    # MenuItemSerializer representation (title, category, ...); never mutate
+    data: dict
+
+
+class CatalogMap(NamedTuple):
+    version: int
+    items: dict
+
+
+_catalog_map = None
+_catalog_map_lock = threading.Lock()
+
+
+def load_catalog_map():
+    """Rebuild the in-process ``menuitem_id -> CatalogEntry`` map from the database."""
+    global _catalog_map
+    with _catalog_map_lock:
+        # Version first: a change committed in between makes the map look
+        # older than it is (and get rebuilt), never newer
+        version, _ = get_catalog_version()
+        menuitems = list(MenuItem.objects.select_related('category'))
+        data = read_serializer(MenuItemSerializer)(menuitems, many=True).data
+        items = {
+            menuitem.id: CatalogEntry(menuitem.price, entry)
+            for menuitem, entry in zip(menuitems, data)
+        }
+        _catalog_map = CatalogMap(version, items)
+        return _catalog_map
+
+
+def get_catalog_map(version=None):
+    """Return the catalog map, rebuilt if it is not at ``version``.
+
+    Without a version the current map is trusted as is; callers that write
+    based on it must check its version in the same statement.
+    """
+    catalog_map = _catalog_map
+    if catalog_map is None or (version is not None and catalog_map.version != version):
+        catalog_map = load_catalog_map()
+    return catalog_map
+
+
+def clear_catalog_map():
+    global _catalog_map
+    _catalog_map = None
+
+
+class CatalogConditionalMixin:
+    """Answer catalog list/retrieve requests with ETag/Last-Modified validators.
+
+    Conditional GETs that still match the current catalog version get a 304
+    before the queryset or serializer is touched.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+    def get_catalog_etag(self, request, version):
+        # The same version renders differently per path, query and format
+        variant = f'{request.get_full_path()}|{request.accepted_renderer.format}'
+        digest = hashlib.sha1(variant.encode()).hexdigest()[:16]
+        return f'"{self.basename}-{version}-{digest}"'
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        version, updated = get_catalog_version()
+        # Let handlers further down reuse the version without another query
+        request.catalog_version = version
+        etag = self.get_catalog_etag(request, version)
+        last_modified = int(updated.timestamp()) if updated else None
+
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+def get_list_cache():
+    return caches[getattr(settings, 'LITTLELEMON_MENU_CACHE_ALIAS', 'default')]
+
+
+class CatalogListCacheMixin:
+    """Cache list response data keyed on catalog version and normalized params.
+
+    Bumping the catalog version makes every existing entry unreachable, so
+    stale pages are never served and simply expire from the cache. Hits and
+    misses are counted for sizing the cache (see ``get_list_cache_stats``).
+    """
+    list_cache_prefix = 'littlelemon:list'
+    list_cache_params = ()
+
+    def normalize_list_params(self, request):
+        # Raw values: the filters see them unstripped, so the key must too
+        params = request.query_params
+        return {name: params.get(name, '') for name in self.list_cache_params}
+
+    def get_list_cache_key(self, request, version):
+        variant = repr([
+            request.build_absolute_uri('/'),
+            request.accepted_renderer.format,
+            sorted(self.normalize_list_params(request).items()),
+        ])
+        digest = hashlib.sha1(variant.encode()).hexdigest()
+        return f'{self.list_cache_prefix}:{self.basename}:{version}:{digest}'
+
+    def list(self, request, *args, **kwargs):
+        version = getattr(request, 'catalog_version', None)
+        if version is None:
+            version, _ = get_catalog_version()
+
+        list_cache = get_list_cache()
+        key = self.get_list_cache_key(request, version)
+        data = list_cache.get(key)
+        if data is not None:
+            self.count_list_cache('hits')
+            return Response(data)
+
+        self.count_list_cache('misses')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            list_cache.set(
+                key, response.data, getattr(settings, 'LITTLELEMON_MENU_CACHE_TTL', 300)
+            )
+        return response
+
+    def count_list_cache(self, outcome):
+        list_cache = get_list_cache()
+        key = f'{self.list_cache_prefix}:{self.basename}:{outcome}'
+        list_cache.add(key, 0, None)
+        try:
+            list_cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            list_cache.set(key, 1, None)
+
+    def get_list_cache_stats(self):
+        list_cache = get_list_cache()
+        prefix = f'{self.list_cache_prefix}:{self.basename}'
+        hits = list_cache.get(f'{prefix}:hits', 0)
+        misses = list_cache.get(f'{prefix}:misses', 0)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / lookups, 4) if lookups else None,
+        }
+
+
+SNAPSHOT_KEY = 'littlelemon:snapshot'
+
+
+def build_menu_snapshot(version):
+    """Render categories with their items, and the featured items, to JSON bytes."""
+    catalog_map = get_catalog_map(version)
+    menuitems = [catalog_map.items[menuitem_id].data for menuitem_id in sorted(catalog_map.items)]
+    categories = list(Category.objects.order_by('id'))
+    by_category = {category.id: [] for category in categories}
+    for menuitem in menuitems:
+        by_category[menuitem['category']['id']].append(menuitem)
+
+    data = {
+        'categories': [
+            {**category, 'items': by_category[category['id']]}
+            for category in read_serializer(CategorySerializer)(categories, many=True).data
+        ],
+        'featured': [menuitem for menuitem in menuitems if menuitem['featured']],
+    }
+    body = FastJSONRenderer().render(data)
+    etag = f'"menu-snapshot-{hashlib.sha1(body).hexdigest()[:16]}"'
+    return etag, body
+
+
+def get_menu_snapshot():
+    """Return ``(etag, body)`` of the menu snapshot, building it on first use.
+
+    Keyed on the committed catalog version like the cached list pages, so
+    a change made by any process is picked up on the next read; a hit
+    costs that one version query.
+    """
+    version, _ = get_catalog_version()
+    list_cache = get_list_cache()
+    key = f'{SNAPSHOT_KEY}:{version}'
+    snapshot = list_cache.get(key)
+    if snapshot is None:
+        snapshot = build_menu_snapshot(version)
+        list_cache.set(key, snapshot, getattr(settings, 'LITTLELEMON_MENU_CACHE_TTL', 300))
+    return snapshot
@@ -0,0 +1,60 @@
+"""Database tuning: SQLite pragmas on connect and the optional read-replica router."""
+import re
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRAGMA_VALUE = re.compile(r'^-?[\w.]+$')
+
+# Set by ReadReplicaMiddleware for the duration of a safe (GET/HEAD) request
+use_read_database = ContextVar('littlelemon_use_read_database', default=False)
+
+
+def read_database():
+    alias = getattr(settings, 'LITTLELEMON_READ_DATABASE', None)
+    return alias if alias in settings.DATABASES else None
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """``connection_created`` receiver applying ``LITTLELEMON_SQLITE_PRAGMAS``.
+
+    Runs once per new SQLite connection, so with ``CONN_MAX_AGE`` the cost
+    is paid once per worker rather than once per request. Connections to
+    the read database are also made ``query_only``.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(getattr(settings, 'LITTLELEMON_SQLITE_PRAGMAS', {}))
+    if connection.alias == read_database():
+        pragmas['query_only'] = 'on'
+    if not pragmas:
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if not name.isidentifier() or not PRAGMA_VALUE.match(str(value)):
+                raise ValueError(f'Invalid SQLite pragma {name}={value!r}')
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+class ReadReplicaRouter:
+    """Send reads made during GET/HEAD requests to ``LITTLELEMON_READ_DATABASE``.
+
+    Writes, and every read outside a safe request (including reads inside
+    POST/PUT/PATCH/DELETE handlers), stay on ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if use_read_database.get():
+            return read_database()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != read_database()
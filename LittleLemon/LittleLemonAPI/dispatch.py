@@ -0,0 +1,99 @@
+"""Balance unassigned open orders across the delivery crew."""
+import heapq
+
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.db.models import Case, Count, Value, When
+
+from .models import Order, OrderStatus
+from .notifier import publish_crew_changes
+from .roles import DELIVERY_CREW
+
+DISPATCH_BATCH_SIZE = 500
+
+
+def open_orders():
+    return Order.objects.filter(status__lt=OrderStatus.DELIVERED)
+
+
+def unassigned_orders():
+    return open_orders().filter(delivery_crew__isnull=True)
+
+
+def open_order_counts(crew_ids):
+    """``(crew_id, open orders)`` rows for the crew members in ``crew_ids``."""
+    return (
+        open_orders()
+        .filter(delivery_crew__in=crew_ids)
+        .order_by()
+        .values_list('delivery_crew')
+        .annotate(open=Count('id'))
+    )
+
+
+def crew_loads():
+    """Return ``{crew_id: open orders assigned}`` for every active crew member."""
+    crew = dict.fromkeys(
+        User.objects.filter(groups__name=DELIVERY_CREW, is_active=True).values_list('id', flat=True), 0
+    )
+    crew.update(open_order_counts(list(crew)))
+    return crew
+
+
+def assign_open_orders(limit=None, batch_size=DISPATCH_BATCH_SIZE):
+    """Assign unassigned open orders, oldest first, to the least-loaded crew.
+
+    Orders are read and written in batches: one SELECT of ids, then one
+    UPDATE whose CASE has a branch per crew member (not per order, as
+    bulk_update would build). Each batch runs in its own transaction, locks
+    its rows with ``SKIP LOCKED`` where supported and only updates orders
+    that are still unassigned, so concurrent runs and manual assignments are
+    never overwritten. Returns the number of orders assigned and the
+    resulting open-order count per crew member.
+    """
+    loads = crew_loads()
+    if not loads:
+        return {'assigned': 0, 'crew': []}
+
+    # Min-heap of (load, crew_id): ties go to the lowest id, deterministically
+    heap = [(load, crew_id) for crew_id, load in loads.items()]
+    heapq.heapify(heap)
+    connection = connections[router.db_for_write(Order)]
+    assigned = 0
+
+    while limit is None or assigned < limit:
+        size = batch_size if limit is None else min(batch_size, limit - assigned)
+        unassigned = unassigned_orders()
+        with transaction.atomic(using=connection.alias):
+            batch = unassigned.order_by('id').values_list('id', flat=True)
+            if connection.features.has_select_for_update_skip_locked:
+                batch = batch.select_for_update(skip_locked=True)
+            order_ids = list(batch[:size])
+            if not order_ids:
+                break
+
+            plan = {}
+            for order_id in order_ids:
+                load, crew_id = heapq.heappop(heap)
+                plan.setdefault(crew_id, []).append(order_id)
+                heapq.heappush(heap, (load + 1, crew_id))
+            updated = unassigned.filter(id__in=order_ids).update(delivery_crew_id=Case(
+                *(When(id__in=ids, then=Value(crew_id)) for crew_id, ids in plan.items())
+            ))
+            if updated == len(order_ids):
+                for crew_id, ids in plan.items():
+                    loads[crew_id] += len(ids)
+            else:
+                # Some orders were assigned or closed since the SELECT: count
+                # what each crew member really holds and rebalance from there
+                loads.update(dict.fromkeys(plan, 0))
+                loads.update(open_order_counts(list(plan)))
+                heap = [(load, crew_id) for crew_id, load in loads.items()]
+                heapq.heapify(heap)
+            publish_crew_changes(*plan)
+        assigned += updated
+
+    return {
+        'assigned': assigned,
+        'crew': [{'id': crew_id, 'open_orders': load} for crew_id, load in sorted(loads.items())],
+    }
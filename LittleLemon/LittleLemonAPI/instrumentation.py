@@ -0,0 +1,247 @@
+"""Per-request cost accounting for the API.
+
+``LittleLemon.middleware.RequestMetricsMiddleware`` opens a
+``RequestMetrics`` for every request. SQL executed on any connection and
+time spent in serializers are charged to it through a context variable,
+which also follows requests into ``sync_to_async`` threads. Finished
+requests are folded into the process-wide ``registry``, served to managers
+in Prometheus text format.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('littlelemon_request_metrics', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class RequestMetrics:
+    __slots__ = ('sql_count', 'sql_time', 'serializer_time', 'serializing')
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Connection execute wrapper charging SQL to the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_time += time.perf_counter() - start
+        metrics.sql_count += 1
+
+
+def install_sql_wrapper(connection):
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+@contextmanager
+def serializer_timer():
+    """Charge the enclosed block to serializer time, ignoring nested use."""
+    metrics = _current.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+        metrics.serializing = False
+
+
+class ChargedStream:
+    """A streaming response body whose SQL is charged to ``metrics``.
+
+    Streamed bodies are produced after the middleware has returned, so each
+    chunk is pulled with the request's metrics made current again.
+    ``on_close`` runs once, when the body is exhausted or the server closes
+    it (e.g. the client went away).
+    """
+
+    def __init__(self, iterator, metrics, on_close):
+        self._iterator = iterator
+        self._metrics = metrics
+        self._on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = _current.set(self._metrics)
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self.close()
+            raise
+        finally:
+            _current.reset(token)
+
+    def close(self):
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+
+class AsyncChargedStream:
+    """``ChargedStream`` for async streaming bodies (e.g. Server-Sent Events).
+
+    Not a subclass: Django treats any body that supports ``iter()`` as sync.
+    """
+
+    __init__ = ChargedStream.__init__
+    close = ChargedStream.close
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        token = _current.set(self._metrics)
+        try:
+            return await anext(self._iterator)
+        except StopAsyncIteration:
+            self.close()
+            raise
+        finally:
+            _current.reset(token)
+
+
+def charge_stream(response, metrics, on_close):
+    """Wrap ``response``'s streaming body in a ``ChargedStream``."""
+    if response.is_async:
+        stream = AsyncChargedStream(aiter(response.streaming_content), metrics, on_close)
+    else:
+        stream = ChargedStream(iter(response.streaming_content), metrics, on_close)
+    response.streaming_content = stream
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteMetrics:
+    __slots__ = ('duration', 'queries', 'sql_seconds', 'serializer_seconds', 'statuses')
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, view, method, status_code, duration, metrics):
+        key = (view, method)
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                route = self._routes[key] = RouteMetrics()
+            route.duration.observe(duration)
+            route.queries.observe(metrics.sql_count)
+            route.sql_seconds += metrics.sql_time
+            route.serializer_seconds += metrics.serializer_time
+            route.statuses[status_code] = route.statuses.get(status_code, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render_prometheus(self):
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+            self._render_histogram(
+                lines, 'littlelemon_request_duration_seconds',
+                'Wall time per request.', routes, 'duration',
+            )
+            self._render_histogram(
+                lines, 'littlelemon_request_sql_queries',
+                'SQL queries per request.', routes, 'queries',
+            )
+            self._render_counter(
+                lines, 'littlelemon_request_sql_seconds_total',
+                'Time spent executing SQL.', routes, 'sql_seconds',
+            )
+            self._render_counter(
+                lines, 'littlelemon_request_serializer_seconds_total',
+                'Time spent in serializers.', routes, 'serializer_seconds',
+            )
+            lines.append('# HELP littlelemon_responses_total Responses by status code.')
+            lines.append('# TYPE littlelemon_responses_total counter')
+            for (view, method), route in routes:
+                for status_code, count in sorted(route.statuses.items()):
+                    labels = _labels(view=view, method=method, status=status_code)
+                    lines.append(f'littlelemon_responses_total{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histogram(lines, name, help_text, routes, attr):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (view, method), route in routes:
+            histogram = getattr(route, attr)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                labels = _labels(view=view, method=method, le=bound)
+                lines.append(f'{name}_bucket{{{labels}}} {cumulative}')
+            labels = _labels(view=view, method=method)
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+    @staticmethod
+    def _render_counter(lines, name, help_text, routes, attr):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (view, method), route in routes:
+            labels = _labels(view=view, method=method)
+            lines.append(f'{name}{{{labels}}} {getattr(route, attr):.6f}')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,33 @@
+"""Order status transitions, applied to many orders in one statement."""
+from django.db import transaction
+
+from .models import Order, OrderStatus
+from .notifier import publish_crew_changes
+
+# Most orders one transition request may move
+TRANSITION_BATCH_LIMIT = 1000
+
+# Statuses the delivery crew may set on the orders assigned to them
+CREW_STATUSES = frozenset([OrderStatus.OUT_FOR_DELIVERY, OrderStatus.DELIVERED])
+CREW_STATUS_MESSAGE = 'Delivery crew can only mark orders out for delivery or delivered.'
+
+
+def transition_orders(orders, target):
+    """Move every order in ``orders`` that may transition to ``target``.
+
+    One SELECT finds the eligible orders (and the crew whose feeds change),
+    then a single UPDATE, still conditional on the current status, moves
+    them. Orders already at or past ``target`` are left alone. Returns the
+    ids of the orders moved.
+    """
+    with transaction.atomic():
+        eligible = list(
+            orders.filter(status__lt=target).select_for_update().order_by()
+            .values_list('id', 'delivery_crew_id')
+        )
+        if not eligible:
+            return []
+        ids = [order_id for order_id, _ in eligible]
+        Order.objects.filter(pk__in=ids, status__lt=target).update(status=target)
+        publish_crew_changes(*{crew_id for _, crew_id in eligible})
+    return ids
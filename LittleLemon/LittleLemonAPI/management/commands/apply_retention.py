@@ -0,0 +1,73 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from LittleLemonAPI.retention import (
+    RETENTION_BATCH_SIZE,
+    NDJSONArchive,
+    archive_orders,
+    archive_to_table,
+    enable_incremental_vacuum,
+    incremental_vacuum,
+    purge_idle_carts,
+)
+
+
+class Command(BaseCommand):
+    help = 'Archive delivered orders past the retention horizon, purge idle carts and reclaim free pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--order-days', type=int,
+            default=getattr(settings, 'LITTLELEMON_ORDER_RETENTION_DAYS', 730),
+            help='Archive delivered orders older than this many days.'
+        )
+        parser.add_argument(
+            '--cart-days', type=int,
+            default=getattr(settings, 'LITTLELEMON_CART_IDLE_DAYS', 30),
+            help='Purge cart lines not updated for this many days.'
+        )
+        parser.add_argument(
+            '--ndjson', metavar='DIR',
+            help='Append archived orders to an NDJSON file in DIR instead of the archive table.'
+        )
+        parser.add_argument('--batch-size', type=int, default=RETENTION_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+        parser.add_argument(
+            '--vacuum-pages', type=int, default=1000,
+            help='Free pages to return to the filesystem (SQLite, auto_vacuum=INCREMENTAL).'
+        )
+        parser.add_argument(
+            '--enable-incremental-vacuum', action='store_true',
+            help='One-off: switch SQLite to auto_vacuum=INCREMENTAL (runs a full VACUUM).'
+        )
+
+    def handle(self, *args, **options):
+        if options['order_days'] < 1 or options['cart_days'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--order-days, --cart-days and --batch-size must be positive.')
+
+        now = timezone.now()
+        sink = archive_to_table
+        if options['ndjson']:
+            if not os.path.isdir(options['ndjson']):
+                raise CommandError(f"{options['ndjson']} is not a directory.")
+            sink = NDJSONArchive(os.path.join(options['ndjson'], f'orders-{now:%Y%m%d%H%M%S}.ndjson'))
+        batching = {'batch_size': options['batch_size'], 'pause': options['pause']}
+
+        archived = archive_orders(
+            timezone.localdate(now) - timedelta(days=options['order_days']), sink, **batching
+        )
+        self.stdout.write(f'Archived {archived} order(s).')
+        purged = purge_idle_carts(now - timedelta(days=options['cart_days']), **batching)
+        self.stdout.write(f'Purged {purged} idle cart line(s).')
+
+        if options['enable_incremental_vacuum'] and enable_incremental_vacuum():
+            self.stdout.write('Enabled incremental vacuum.')
+        freed = incremental_vacuum(options['vacuum_pages'])
+        if freed is None:
+            self.stdout.write('Skipped vacuum: the database is not in auto_vacuum=INCREMENTAL mode.')
+        else:
+            self.stdout.write(f'Freed {freed} page(s).')
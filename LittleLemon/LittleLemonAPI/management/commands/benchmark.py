@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.benchmarks import (
+    SCENARIOS,
+    isolated_database,
+    load_baseline,
+    regressions,
+    save_baseline,
+)
+
+
+class Command(BaseCommand):
+    help = 'Run LittleLemonAPI benchmark scenarios against a throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help='Scenarios to run (default: all).')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed calls per case.')
+        parser.add_argument(
+            '--scale', type=int, default=1,
+            help='Size multiplier for the dataset seeded by the endpoints scenario.',
+        )
+        parser.add_argument(
+            '--cart-sizes', type=int, nargs='+', default=[1, 5, 20, 50],
+            help='Cart lines per order for the order-create scenario.',
+        )
+        parser.add_argument(
+            '--menu-sizes', type=int, nargs='+', default=[1000, 10000, 30000],
+            help='Menu items for the menu-search scenario.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 8, 32],
+            help='Concurrent requests for the asgi-vs-wsgi scenario.',
+        )
+        parser.add_argument('--save-baseline', metavar='PATH', help='Write results to a JSON baseline.')
+        parser.add_argument('--compare', metavar='PATH', help='Fail on regressions against a JSON baseline.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed relative p50 slowdown when comparing (default: 0.25).',
+        )
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(SCENARIOS)
+        unknown = sorted(set(names) - set(SCENARIOS))
+        if unknown:
+            raise CommandError(
+                f"Unknown scenario(s): {', '.join(unknown)}. "
+                f"Available: {', '.join(SCENARIOS)}"
+            )
+
+        results = {}
+        for name in names:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            results[name] = {}
+            with isolated_database():
+                for row in SCENARIOS[name](options):
+                    case = row.pop('case')
+                    results[name][case] = row
+                    line = (
+                        f"  {case:<32} p50 {row['p50_ms']:8.2f} ms   "
+                        f"p99 {row['p99_ms']:8.2f} ms   {row['queries']:6.1f} queries   "
+                        f"{row['alloc_kib']:9.1f} KiB"
+                    )
+                    if 'rps' in row:
+                        line += f"   {row['rps']:8.1f} req/s"
+                    if 'rows_per_s' in row:
+                        line += f"   {row['rows_per_s']:8.0f} rows/s"
+                    if row.get('errors'):
+                        line += f"   {row['errors']} errors"
+                    self.stdout.write(line)
+
+        if options['save_baseline']:
+            save_baseline(options['save_baseline'], results)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+
+        if options['compare']:
+            found = regressions(results, load_baseline(options['compare']), options['tolerance'])
+            for line in found:
+                self.stdout.write(self.style.ERROR(f'REGRESSION  {line}'))
+            if found:
+                raise CommandError(f'{len(found)} regression(s) against {options["compare"]}.')
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.query_plans import full_scans, representative_queries
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the queries issued by the API views and fail on full table scans.'
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, queryset, expected in representative_queries():
+            plan = queryset.explain()
+            scans = full_scans(plan, expected)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'FULL SCAN  {name}'))
+                for line in scans:
+                    self.stdout.write(f'    {line}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'ok         {name}'))
+            if options['verbosity'] > 1:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} quer(ies) fall back to a full scan.')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI.dispatch import DISPATCH_BATCH_SIZE, assign_open_orders
+
+
+class Command(BaseCommand):
+    help = 'Assign unassigned open orders to the least-loaded delivery crew members.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Assign at most this many orders.')
+        parser.add_argument('--batch-size', type=int, default=DISPATCH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        result = assign_open_orders(limit=options['limit'], batch_size=options['batch_size'])
+        self.stdout.write(f"Assigned {result['assigned']} order(s).")
+        for crew in result['crew']:
+            self.stdout.write(f"  crew {crew['id']:<6} {crew['open_orders']} open")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from LittleLemonAPI.analytics import rebuild_rollups
+from LittleLemonAPI.reports import date_range
+from LittleLemonAPI.retention import archived_through
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups from the order tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD); defaults to all history.')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD); defaults to all history.')
+
+    def handle(self, *args, **options):
+        try:
+            start, end = date_range(options)
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+
+        archived = archived_through()
+        if archived is not None and (start is None or start <= archived):
+            # Rebuilding from the live tables would drop the archived days
+            raise CommandError(f'Orders up to {archived} are archived; pass a --start after that day.')
+
+        for table, rows in rebuild_rollups(start, end).items():
+            self.stdout.write(f'{table:<20} {rows} rows')
@@ -0,0 +1,125 @@
+"""Bulk import and export of the whole menu."""
+from django.db import transaction
+from .catalog import bump_catalog_version
+from .models import Category, MenuItem
+from .serializers import MenuItemSerializer
+from .streaming import chunked
+
+EXPORT_FIELDS = ('id', 'title', 'price', 'featured', 'category')
+UPDATE_FIELDS = ('title', 'price', 'featured', 'category_id')
+IMPORT_CHUNK_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportRejected(Exception):
+    """Raised inside the import transaction so no row is written."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def export_menu_rows():
+    """Yield menu items as tuples of EXPORT_FIELDS using a server-side cursor."""
+    return menu_export_queryset().iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def menu_export_queryset():
+    return MenuItem.objects.order_by('id').values_list(
+        'id', 'title', 'price', 'featured', 'category__slug'
+    )
+
+
+def import_menu_rows(rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """Create or update menu items from ``(line_number, dict)`` rows.
+
+    Rows carry ``title``, ``price``, optionally ``featured`` and a
+    ``category`` slug; rows with an ``id`` update that item, others create
+    one. Each chunk is validated with MenuItemSerializer and written with
+    bulk_create / bulk_update, all in one transaction: any invalid row
+    rejects the whole import with ImportRejected listing the bad lines.
+    """
+    categories = dict(Category.objects.values_list('slug', 'id'))
+    errors = []
+    created = updated = 0
+
+    with transaction.atomic():
+        for chunk in chunked(rows, chunk_size):
+            items, chunk_errors = _validate_chunk(chunk, categories)
+            errors.extend(chunk_errors)
+            if errors:
+                # Keep validating to report every bad line, but stop writing
+                if len(errors) >= MAX_REPORTED_ERRORS:
+                    break
+                continue
+
+            existing = MenuItem.objects.in_bulk([pk for _, pk, _ in items if pk is not None])
+            new_items, changed_items = [], []
+            for line, pk, values in items:
+                if pk is None:
+                    new_items.append(MenuItem(**values))
+                elif pk in existing:
+                    item = existing[pk]
+                    for field, value in values.items():
+                        setattr(item, field, value)
+                    changed_items.append(item)
+                else:
+                    errors.append({'line': line, 'errors': {'id': [f'No menu item with id {pk}.']}})
+            if errors:
+                continue
+
+            MenuItem.objects.bulk_create(new_items)
+            MenuItem.objects.bulk_update(changed_items, UPDATE_FIELDS)
+            created += len(new_items)
+            updated += len(changed_items)
+
+        if errors:
+            raise ImportRejected(errors[:MAX_REPORTED_ERRORS])
+        if created or updated:
+            # bulk_create/bulk_update do not send the signals that do this
+            bump_catalog_version()
+
+    return {'created': created, 'updated': updated}
+
+
+def _validate_chunk(chunk, categories):
+    data, ids, errors = [], [], {}
+    for line, row in chunk:
+        if row is None:
+            errors.setdefault(line, {})['non_field_errors'] = ['Not a JSON object.']
+            row = {}
+        slug = str(row.get('category') or '').strip()
+        if slug not in categories:
+            errors.setdefault(line, {})['category'] = [f'Unknown category "{slug}".']
+        pk = str(row.get('id') or '').strip()
+        if pk and not pk.isdigit():
+            errors.setdefault(line, {})['id'] = ['A valid integer is required.']
+        ids.append(int(pk) if pk.isdigit() else None)
+
+        values = {
+            'title': row.get('title'),
+            'price': row.get('price'),
+            'category_id': categories.get(slug, 0),
+        }
+        if row.get('featured') not in (None, ''):
+            values['featured'] = row['featured']
+        data.append(values)
+
+    serializer = MenuItemSerializer(data=data, many=True)
+    if not serializer.is_valid():
+        row_errors = serializer.errors
+        # Newer DRF reports list errors as {index: errors} instead of a list
+        if not isinstance(row_errors, dict):
+            row_errors = dict(enumerate(row_errors))
+        for index, error in row_errors.items():
+            if error:
+                errors.setdefault(chunk[index][0], {}).update(error)
+    if errors:
+        return [], [{'line': line, 'errors': errors[line]} for line in sorted(errors)]
+
+    items = [
+        (line, pk, {field: values[field] for field in UPDATE_FIELDS if field in values})
+        for (line, _), pk, values in zip(chunk, ids, serializer.validated_data)
+    ]
+    return items, []
@@ -0,0 +1,82 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'LittleLemonAPI_menuitem_fts'
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5(title, category, tokenize='trigram')
+    """,
+    f"""
+    INSERT INTO "{FTS_TABLE}" (rowid, title, category)
+    SELECT m.id, m.title, c.title
+    FROM "LittleLemonAPI_menuitem" m
+    JOIN "LittleLemonAPI_category" c ON c.id = m.category_id
+    """,
+    f"""
+    CREATE TRIGGER "{FTS_TABLE}_insert" AFTER INSERT ON "LittleLemonAPI_menuitem" BEGIN
+        INSERT INTO "{FTS_TABLE}" (rowid, title, category)
+        VALUES (new.id, new.title,
+                (SELECT title FROM "LittleLemonAPI_category" WHERE id = new.category_id));
+    END
+    """,
+    f"""
+    CREATE TRIGGER "{FTS_TABLE}_update" AFTER UPDATE OF title, category_id ON "LittleLemonAPI_menuitem" BEGIN
+        DELETE FROM "{FTS_TABLE}" WHERE rowid = old.id;
+        INSERT INTO "{FTS_TABLE}" (rowid, title, category)
+        VALUES (new.id, new.title,
+                (SELECT title FROM "LittleLemonAPI_category" WHERE id = new.category_id));
+    END
+    """,
+    f"""
+    CREATE TRIGGER "{FTS_TABLE}_delete" AFTER DELETE ON "LittleLemonAPI_menuitem" BEGIN
+        DELETE FROM "{FTS_TABLE}" WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER "{FTS_TABLE}_category_update" AFTER UPDATE OF title ON "LittleLemonAPI_category" BEGIN
+        UPDATE "{FTS_TABLE}" SET category = new.title
+        WHERE rowid IN (SELECT id FROM "LittleLemonAPI_menuitem" WHERE category_id = new.id);
+    END
+    """,
+]
+
+DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_category_update"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_delete"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_update"',
+    f'DROP TRIGGER IF EXISTS "{FTS_TABLE}_insert"',
+    f'DROP TABLE IF EXISTS "{FTS_TABLE}"',
+]
+
+
+def create_search_index(apps, schema_editor):
+    # Other backends, and SQLite builds without FTS5, keep the LIKE search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize='trigram')")
+            cursor.execute('DROP TABLE temp.fts5_probe')
+    except OperationalError:
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0002_catalogversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+# The boolean status stored 1 for delivered; PREPARING and OUT_FOR_DELIVERY
+# did not exist, so every 1 at this point means DELIVERED (3)
+DELIVERED = 3
+
+
+def forwards(apps, schema_editor):
+    Order = apps.get_model('LittleLemonAPI', 'Order')
+    Order.objects.filter(status=1).update(status=DELIVERED)
+
+
+def backwards(apps, schema_editor):
+    Order = apps.get_model('LittleLemonAPI', 'Order')
+    Order.objects.filter(status__lt=DELIVERED).update(status=0)
+    Order.objects.filter(status=DELIVERED).update(status=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0006_sales_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_crew_status_idx',
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Placed'), (1, 'Preparing'), (2, 'Out for delivery'), (3, 'Delivered')], default=0),
+        ),
+        migrations.RunPython(forwards, backwards),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'delivery_crew'], name='order_status_crew_idx'),
+        ),
+    ]
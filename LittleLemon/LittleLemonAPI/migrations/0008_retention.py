@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:57
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0007_order_status_lifecycle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField(db_index=True)),
+                ('delivery_crew_id', models.IntegerField(null=True)),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'Placed'), (1, 'Preparing'), (2, 'Out for delivery'), (3, 'Delivered')])),
+                ('total', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('date', models.DateField(db_index=True)),
+                ('items', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
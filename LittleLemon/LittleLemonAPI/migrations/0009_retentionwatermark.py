@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:10
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_watermark(apps, schema_editor):
+    # Orders archived to the table before the watermark existed
+    ArchivedOrder = apps.get_model('LittleLemonAPI', 'ArchivedOrder')
+    RetentionWatermark = apps.get_model('LittleLemonAPI', 'RetentionWatermark')
+    archived = ArchivedOrder.objects.aggregate(date=Max('date'))['date']
+    if archived is not None:
+        RetentionWatermark.objects.create(pk=1, archived_through=archived)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0008_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archived_through', models.DateField()),
+            ],
+        ),
+        migrations.RunPython(seed_watermark, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -20,23 +21,69 @@ class MenuItem(models.Model):
     def __str__(self):
         return self.title
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['price', 'id'], name='menuitem_price_idx'),
+            models.Index(fields=['category', 'price'], name='menuitem_category_price_idx'),
+        ]
+
+class MenuItemSearchIndex(models.Model):
+    """A row of the SQLite FTS5 index over menu item and category titles.
+
+    The table and the triggers keeping it in step are created by migration
+    0003, and only where FTS5 is available (see search.py). Unmanaged: the
+    model exists so searches can join it.
+    """
+    menuitem = models.OneToOneField(
+        MenuItem,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_index',
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'LittleLemonAPI_menuitem_fts'
+
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.SmallIntegerField()
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
     price = models.DecimalField(max_digits=6, decimal_places=2)
+    # Last add to this line; idle carts are purged by apply_retention
+    updated = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ('menuitem', 'user')
 
+class OrderStatus(models.IntegerChoices):
+    """Order lifecycle. Orders only move forward, possibly skipping states."""
+    PLACED = 0, 'Placed'
+    PREPARING = 1, 'Preparing'
+    OUT_FOR_DELIVERY = 2, 'Out for delivery'
+    DELIVERED = 3, 'Delivered'
+
+    @classmethod
+    def can_transition(cls, current, target):
+        return target > current
+
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     delivery_crew = models.ForeignKey(User, related_name='delivery_crew', on_delete=models.SET_NULL, null=True)
-    status = models.BooleanField(default=0)
+    status = models.PositiveSmallIntegerField(choices=OrderStatus.choices, default=OrderStatus.PLACED)
     total = models.DecimalField(max_digits=6, decimal_places=2)
     date = models.DateField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'], name='order_date_idx'),
+            models.Index(fields=['user', 'date'], name='order_user_date_idx'),
+            models.Index(fields=['status', 'delivery_crew'], name='order_status_crew_idx'),
+        ]
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -44,4 +91,57 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2)
 
     class Meta:
-        unique_together = ('order', 'menuitem')
\ No newline at end of file
+        unique_together = ('order', 'menuitem')
+
+class CatalogVersion(models.Model):
+    """Single-row counter bumped whenever a menu item or category changes."""
+    version = models.PositiveBigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+class DailySales(models.Model):
+    """Per-day order rollup, maintained as orders are placed (see analytics.py)."""
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    items = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+class CategoryDailySales(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'category')
+
+class MenuItemDailySales(models.Model):
+    date = models.DateField()
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'menuitem')
+
+class ArchivedOrder(models.Model):
+    """A delivered order moved out of the live tables by apply_retention.
+
+    Keeps the original id and plain user ids (no foreign keys, so users can
+    be deleted); the order lines are inlined as ``[menuitem_id, quantity,
+    price]`` lists.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user_id = models.IntegerField(db_index=True)
+    delivery_crew_id = models.IntegerField(null=True)
+    status = models.PositiveSmallIntegerField(choices=OrderStatus.choices)
+    total = models.DecimalField(max_digits=6, decimal_places=2)
+    date = models.DateField(db_index=True)
+    items = models.JSONField(encoder=DjangoJSONEncoder)
+
+class RetentionWatermark(models.Model):
+    """Single-row date up to which orders have been archived, whatever the sink.
+
+    Advanced in the transaction that deletes each archived batch, so it
+    always covers every order removed from the live tables.
+    """
+    archived_through = models.DateField()
@@ -0,0 +1,87 @@
+"""In-process change notifications for the delivery crew feed.
+
+Writers publish the ids of the crew members whose open orders changed;
+feed requests await those ids on their event loop instead of polling the
+database. Versions are per process: cursors carry the process ``epoch``
+so a cursor from another worker or before a restart is treated as stale
+(the client just gets fresh data), and long-poll timeouts bound how long a
+change published in another process can go unnoticed.
+"""
+import asyncio
+import secrets
+import threading
+
+from django.db import transaction
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ChangeNotifier:
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._versions = {}
+        self._waiters = {}
+
+    def version(self, key):
+        return self._versions.get(key, 0)
+
+    def publish(self, keys):
+        """Bump the version of every key and wake whoever is waiting on them."""
+        with self._lock:
+            self._sequence += 1
+            woken = []
+            for key in keys:
+                self._versions[key] = self._sequence
+                woken.extend(self._waiters.pop(key, ()))
+        for loop, future in woken:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The waiter's event loop has already closed
+                pass
+
+    async def wait(self, key, since, timeout):
+        """Return ``key``'s version once it is newer than ``since``, or after ``timeout``."""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            if self.version(key) > since:
+                return self.version(key)
+            self._waiters.setdefault(key, set()).add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(key)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[key]
+        return self.version(key)
+
+    def cursor(self, key):
+        return f'{self.epoch}-{self.version(key)}'
+
+    def parse_cursor(self, cursor):
+        """Return the version a cursor stands for, or -1 if it is missing or stale."""
+        epoch, _, version = (cursor or '').partition('-')
+        if epoch != self.epoch or not version.isdigit():
+            return -1
+        return int(version)
+
+
+notifier = ChangeNotifier()
+
+
+def publish_crew_changes(*crew_ids):
+    """Notify the given crew members' feeds once the current transaction commits."""
+    keys = {crew_id for crew_id in crew_ids if crew_id is not None}
+    if keys:
+        transaction.on_commit(lambda: notifier.publish(keys))
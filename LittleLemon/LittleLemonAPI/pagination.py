@@ -0,0 +1,156 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Seek-based pagination over a unique, stable ordering.
+
+    Each page is fetched with ``WHERE (key) > (last key) ... LIMIT n`` on
+    the view's ``keyset_ordering`` (e.g. ``('-date', '-id')``), so it costs
+    the same on page 1 and page 10,000 and no COUNT query is issued. The
+    opaque ``cursor`` encodes the boundary row's key and the direction.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(view.get_keyset_ordering())
+        self.cursor = self.decode_cursor(request, queryset.model)
+
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        ordering = self.flip(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor:
+            queryset = queryset.filter(self.seek_filter(ordering, self.cursor['position']))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else self.cursor is not None
+        self.has_previous = self.cursor is not None if not reverse else has_more
+        self.first, self.last = (rows[0], rows[-1]) if rows else (None, None)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.position(self.last), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self.encode_cursor(self.position(self.first), reverse=True)
+
+    @staticmethod
+    def flip(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    @staticmethod
+    def seek_filter(ordering, position):
+        # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), per field direction
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # The redundant bound on the leading field lets the database seek
+        # into the index instead of scanning it from the start.
+        leading = ordering[0]
+        bound = 'lte' if leading.startswith('-') else 'gte'
+        return Q(**{f'{leading.lstrip("-")}__{bound}': position[0]}) & condition
+
+    def position(self, row):
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(row, dict):
+            values = [row[name] for name in names]
+        else:
+            values = [getattr(row, name) for name in names]
+        return [value if isinstance(value, int) else str(value) for value in values]
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = payload['p'], bool(payload['r'])
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            # The cursor is client input: coerce each value as its field would,
+            # so a tampered cursor is a 404 instead of a failing seek filter
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+            if None in position:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return {'position': position, 'reverse': reverse}
+
+
+class KeysetPaginationMixin:
+    """Let clients opt into keyset pagination per request.
+
+    ``?pagination=keyset`` (or any request carrying a ``cursor``) switches
+    from the default page-number pagination to ``KeysetPagination`` over
+    ``get_keyset_ordering()``.
+    """
+    keyset_pagination_class = KeysetPagination
+    keyset_ordering = ('id',)
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def uses_keyset_pagination(self):
+        params = self.request.query_params
+        return (
+            params.get('pagination') == 'keyset'
+            or self.keyset_pagination_class.cursor_query_param in params
+        )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.uses_keyset_pagination():
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
@@ -1,13 +1,15 @@
 from rest_framework.permissions import BasePermission
 
+from .roles import is_manager, is_delivery_crew, is_customer
+
 class IsManagerUser(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Manager').exists()
+        return is_manager(request.user)
 
 class IsDeliveryCrew(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Delivery Crew').exists()
+        return is_delivery_crew(request.user)
 
 class IsCustomerUser(BasePermission):
     def has_permission(self, request, view):
-        return not (request.user.groups.filter(name__in=['Manager', 'Delivery Crew']).exists())
\ No newline at end of file
+        return is_customer(request.user)
\ No newline at end of file
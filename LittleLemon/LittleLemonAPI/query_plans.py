@@ -0,0 +1,97 @@
+"""The queries behind every hot path in views.py.
+
+``python manage.py check_query_plans`` EXPLAINs each of them and fails if
+the database would read a whole table or sort rows without an index.
+"""
+import re
+from datetime import date
+
+from django.contrib.auth.models import User
+from rest_framework.settings import api_settings
+
+from .async_views import crew_open_orders
+from .cart import cart_rows
+from .dispatch import DISPATCH_BATCH_SIZE, open_order_counts, unassigned_orders
+from .menu_io import menu_export_queryset
+from .models import MenuItem, Order
+from .pagination import KeysetPagination
+from .reports import order_export_queryset
+from .roles import DELIVERY_CREW, MANAGER
+from .views import filter_menu_items, order_lines, orders_for
+
+# SQLite: "SCAN table" without an index (an FTS5 MATCH is its index), or a
+# sort in a temporary b-tree. PostgreSQL: "Seq Scan on table".
+FULL_SCAN_PATTERNS = [
+    re.compile(r'\bSCAN (?!.*\bUSING (COVERING )?INDEX\b)(?!.*\bVIRTUAL TABLE INDEX \d+:M)(?!CONSTANT ROW)'),
+    re.compile(r'\bUSE TEMP B-TREE FOR ORDER BY\b'),
+    re.compile(r'\bSeq Scan on\b'),
+]
+
+TEMP_SORT = re.compile(r'\bUSE TEMP B-TREE FOR ORDER BY\b')
+
+
+def whole_table(model):
+    """Pattern for plan lines reading every row of ``model``'s table."""
+    table = re.escape(model._meta.db_table)
+    return re.compile(rf'\bSCAN {table}\b(?! USING)|\bSeq Scan on "?{table}"?(?!\w)')
+
+
+def representative_queries():
+    """Return ``(name, queryset, expected)`` built by the helpers views.py uses.
+
+    The querysets come from the same functions the views call, so a change
+    to any of them is checked here too. ``expected`` holds patterns for
+    plan lines a query needs by design; each is explained where it is given.
+    """
+    customer, crew = User(pk=1), User(pk=2)
+    page = api_settings.PAGE_SIZE
+
+    def menu_items(**params):
+        return filter_menu_items(MenuItem.objects.all(), params)
+
+    return [
+        ('menu-items: retrieve', menu_items().filter(pk=1), ()),
+        # An unfiltered, unsorted page stops after LIMIT rows
+        ('menu-items: list', menu_items()[:page], (whole_table(MenuItem),)),
+        ('menu-items: filter by category', menu_items(category='mains')[:page], ()),
+        ('menu-items: sort by price', menu_items(sort='price')[:page], ()),
+        ('menu-items: sort by -price', menu_items(sort='-price')[:page], ()),
+        ('menu-items: filter by category, sort by price',
+         menu_items(category='mains', sort='price')[:page], ()),
+        # Only the rows the full-text index matched are sorted
+        ('menu-items: search', menu_items(search='lemon tart')[:page], (TEMP_SORT,)),
+        ('menu-items: search, sort by price', menu_items(search='lemon', sort='price')[:page], (TEMP_SORT,)),
+        ('menu-items: keyset page by price',
+         _keyset_page(menu_items(sort='price'), ('price', 'id'), ['9.50', 100]), ()),
+        # Exports read every row on purpose
+        ('menu-items: export', menu_export_queryset(), (whole_table(MenuItem),)),
+        ('cart: list for user', cart_rows(customer), ()),
+        ('orders: list for manager', orders_for(customer, {MANAGER})[:page], (whole_table(Order),)),
+        ('orders: list for customer', orders_for(customer, set())[:page], ()),
+        ('orders: list for delivery crew', orders_for(crew, {DELIVERY_CREW})[:page], ()),
+        ('orders: items for page', order_lines().filter(order_id__in=[1, 2, 3]), ()),
+        ('orders: keyset page for manager',
+         _keyset_page(orders_for(customer, {MANAGER}), ('-date', '-id'), ['2024-12-14', 100]), ()),
+        ('orders: keyset page for customer',
+         _keyset_page(orders_for(customer, set()), ('-date', '-id'), ['2024-12-14', 100]), ()),
+        # Only the crew member's open orders are sorted
+        ('orders: delivery feed', crew_open_orders(crew), (TEMP_SORT,)),
+        ('orders: export', order_export_queryset(), (TEMP_SORT,)),
+        ('orders: export date range', order_export_queryset(date(2024, 1, 1), date(2024, 1, 31)), ()),
+        ('dispatch: unassigned open', unassigned_orders().order_by('id')[:DISPATCH_BATCH_SIZE], ()),
+        ('dispatch: crew loads', open_order_counts([2, 3]), ()),
+    ]
+
+
+def _keyset_page(queryset, ordering, position):
+    seek = KeysetPagination.seek_filter(ordering, position)
+    return queryset.order_by(*ordering).filter(seek)[:KeysetPagination.page_size + 1]
+
+
+def full_scans(plan, expected=()):
+    """Return the lines of an EXPLAIN ``plan`` that indicate an unexpected full scan."""
+    return [
+        line.strip() for line in plan.splitlines()
+        if any(pattern.search(line) for pattern in FULL_SCAN_PATTERNS)
+        and not any(pattern.search(line) for pattern in expected)
+    ]
@@ -0,0 +1,140 @@
+"""Compiled read-only serialization for the hot list/retrieve endpoints.
+
+DRF's ModelSerializer walks its fields for every object, resolving sources
+and calling ``to_representation`` on each one. For GET requests we compile
+the same serializer's readable fields once into a flat plan of
+``(name, getter, converter)`` steps and replay it per object. The output is
+exactly what the full serializer produces (field order, decimal and date
+formats, nested serializers), because the plan is built from it; any field
+type without a fast converter simply keeps its own ``to_representation``.
+"""
+import decimal
+from functools import lru_cache
+from operator import attrgetter
+
+from django.db.models import Manager
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .instrumentation import serializer_timer
+
+
+def identity(value):
+    return value
+
+
+def decimal_converter(field):
+    # Fast path for values the database already returns at the field's scale
+    if (
+        not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        or field.localize
+        or field.normalize_output
+        or field.decimal_places is None
+    ):
+        return field.to_representation
+    exponent = -field.decimal_places
+    slow = field.to_representation
+
+    def convert(value):
+        if isinstance(value, decimal.Decimal) and value.as_tuple().exponent == exponent:
+            return f'{value:f}'
+        return slow(value)
+    return convert
+
+
+def date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    return lambda value: value if isinstance(value, str) else value.isoformat()
+
+
+def field_step(field):
+    """Return ``(name, getter, converter)`` for one readable serializer field."""
+    name, attrs = field.field_name, field.source_attrs
+    getter = identity if field.source == '*' else attrgetter('.'.join(attrs))
+
+    if isinstance(field, serializers.ListSerializer):
+        child = compile_plan(field.child)
+
+        def many(value):
+            if isinstance(value, Manager):
+                value = value.all()
+            return [child(item) for item in value]
+        return name, getter, many
+
+    if isinstance(field, serializers.BaseSerializer):
+        return name, getter, compile_plan(field)
+
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and len(attrs) == 1 and not field.pk_field:
+        # Read the foreign key column instead of loading the related object
+        return name, attrgetter(f'{attrs[0]}_id'), identity
+
+    if type(field) in (serializers.IntegerField, serializers.ReadOnlyField):
+        return name, getter, identity
+    if type(field) in (serializers.CharField, serializers.SlugField):
+        return name, getter, str
+    if type(field) is serializers.BooleanField:
+        return name, getter, lambda value: value if isinstance(value, bool) else field.to_representation(value)
+    if type(field) is serializers.DecimalField:
+        return name, getter, decimal_converter(field)
+    if type(field) is serializers.DateField:
+        return name, getter, date_converter(field)
+    return name, getter, field.to_representation
+
+
+def compile_plan(serializer):
+    """Compile ``serializer``'s readable fields into a function of one instance."""
+    steps = [field_step(field) for field in serializer._readable_fields]
+
+    def represent(instance):
+        if instance is None:
+            return None
+        data = {}
+        for name, getter, convert in steps:
+            value = getter(instance)
+            data[name] = None if value is None else convert(value)
+        return data
+    return represent
+
+
+@lru_cache(maxsize=None)
+def plan_for(serializer_class):
+    return compile_plan(serializer_class())
+
+
+class PlanSerializer:
+    """Read-only drop-in for ``serializer_class(instance, many=...).data``."""
+    serializer_class = None
+
+    def __init__(self, instance=None, many=False, **kwargs):
+        self.instance = instance
+        self.many = many
+
+    @property
+    def data(self):
+        represent = plan_for(self.serializer_class)
+        with serializer_timer():
+            if self.many:
+                return [represent(instance) for instance in self.instance]
+            return represent(self.instance)
+
+
+@lru_cache(maxsize=None)
+def read_serializer(serializer_class):
+    """Return the PlanSerializer class replaying ``serializer_class``."""
+    return type(
+        f'{serializer_class.__name__}Plan', (PlanSerializer,), {'serializer_class': serializer_class}
+    )
+
+
+class ReadSerializerMixin:
+    """Serve list/retrieve GETs through the compiled read serializer."""
+    read_actions = ('list', 'retrieve')
+
+    def get_serializer_class(self):
+        serializer_class = super().get_serializer_class()
+        # The browsable API builds its forms with a POST/PUT request here
+        if self.action in self.read_actions and self.request.method == 'GET':
+            return read_serializer(serializer_class)
+        return serializer_class
@@ -0,0 +1,62 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed.
+
+    Produces the same bytes as JSONRenderer for compact, unescaped output
+    (the default): types orjson does not handle itself go through DRF's
+    encoder, and anything it rejects (e.g. non-string keys) falls back to
+    the stdlib path. Indented or ASCII-only output always uses the stdlib.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same strict-javascript-subset escaping as JSONRenderer
+        return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class StreamingFormatRenderer(BaseRenderer):
+    """Content negotiation target for endpoints that stream their own body.
+
+    Views using these renderers return a StreamingHttpResponse, so
+    ``render`` is only reached for error payloads, which are sent as JSON.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class CSVRenderer(StreamingFormatRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(StreamingFormatRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
@@ -0,0 +1,54 @@
+"""Order history reporting: date-range parsing and streamed export rows."""
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .models import OrderItem
+
+ORDER_EXPORT_FIELDS = (
+    'order_id', 'date', 'customer', 'delivery_crew', 'status', 'order_total',
+    'menuitem_id', 'menuitem', 'quantity', 'price',
+)
+EXPORT_CHUNK_SIZE = 2000
+
+
+def date_range(params):
+    """Return ``(start, end)`` dates from the ``start``/``end`` query params.
+
+    Either bound may be omitted; malformed dates raise a ValidationError.
+    """
+    bounds = []
+    for name in ('start', 'end'):
+        value = params.get(name)
+        try:
+            parsed = parse_date(value) if value else None
+        except ValueError:
+            parsed = None
+        if value and parsed is None:
+            raise ValidationError({name: ['Use the YYYY-MM-DD format.']})
+        bounds.append(parsed)
+    start, end = bounds
+    if start and end and start > end:
+        raise ValidationError({'end': ['Must not be before start.']})
+    return start, end
+
+
+def export_order_rows(start=None, end=None):
+    """Yield one tuple of ORDER_EXPORT_FIELDS per order line, oldest first.
+
+    A single joined values_list query read through a server-side cursor, so
+    memory stays flat however much history is exported.
+    """
+    return order_export_queryset(start, end).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def order_export_queryset(start=None, end=None):
+    queryset = OrderItem.objects.all()
+    if start:
+        queryset = queryset.filter(order__date__gte=start)
+    if end:
+        queryset = queryset.filter(order__date__lte=end)
+    return queryset.order_by('order__date', 'order_id', 'id').values_list(
+        'order_id', 'order__date', 'order__user__username',
+        'order__delivery_crew__username', 'order__status', 'order__total',
+        'menuitem_id', 'menuitem__title', 'quantity', 'price',
+    )
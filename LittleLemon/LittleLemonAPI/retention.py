@@ -0,0 +1,160 @@
+"""Data retention: archive old orders, purge idle carts, reclaim SQLite pages.
+
+Every step works in small batches, each in its own short transaction, so
+live writers only ever wait for one batch. ``apply_retention`` runs them
+all; it is meant to be scheduled (e.g. nightly from cron).
+"""
+import os
+import time
+from collections import defaultdict
+
+from django.db import connections, router, transaction
+from django.db.transaction import TransactionManagementError
+
+from .analytics import keeping_deleted_orders
+from .models import ArchivedOrder, Cart, Order, OrderItem, OrderStatus, RetentionWatermark
+from .streaming import ndjson_lines
+
+RETENTION_BATCH_SIZE = 500
+
+ARCHIVE_FIELDS = ['id', 'user_id', 'delivery_crew_id', 'status', 'total', 'date', 'items']
+
+
+def archive_to_table(rows):
+    ArchivedOrder.objects.bulk_create(ArchivedOrder(**dict(zip(ARCHIVE_FIELDS, row))) for row in rows)
+
+
+class NDJSONArchive:
+    """Archive sink appending one JSON object per order to ``path``.
+
+    Lines are flushed to disk before the batch is deleted, so a failure
+    can repeat orders in the file on the next run but never lose them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, rows):
+        with open(self.path, 'ab') as handle:
+            handle.writelines(ndjson_lines(ARCHIVE_FIELDS, rows))
+            handle.flush()
+            os.fsync(handle.fileno())
+
+
+# Primary key of the single RetentionWatermark row
+WATERMARK_ID = 1
+
+
+def archived_through():
+    """Date of the newest order archived to any sink, or None."""
+    return RetentionWatermark.objects.filter(pk=WATERMARK_ID).values_list(
+        'archived_through', flat=True
+    ).first()
+
+
+def advance_watermark(archived):
+    """Move the archive watermark forward to ``archived`` (never back)."""
+    moved = RetentionWatermark.objects.filter(pk=WATERMARK_ID, archived_through__lt=archived).update(
+        archived_through=archived
+    )
+    if not moved:
+        RetentionWatermark.objects.get_or_create(pk=WATERMARK_ID, defaults={'archived_through': archived})
+
+
+def archivable_orders(before):
+    return Order.objects.filter(status=OrderStatus.DELIVERED, date__lt=before)
+
+
+def archive_orders(before, sink=archive_to_table, batch_size=RETENTION_BATCH_SIZE, pause=0):
+    """Move delivered orders dated before ``before`` (and their lines) to ``sink``.
+
+    ``sink(rows)`` receives ``ARCHIVE_FIELDS`` tuples for one batch, inside
+    the transaction that then deletes those orders and advances the archive
+    watermark. Open orders are never archived, and the sales rollups are
+    left as they are. Returns the number of orders archived.
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                archivable_orders(before).order_by('date', 'id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return archived
+
+            lines = defaultdict(list)
+            for order_id, *line in OrderItem.objects.filter(order_id__in=ids).order_by('id').values_list(
+                'order_id', 'menuitem_id', 'quantity', 'price'
+            ):
+                lines[order_id].append(line)
+            orders = Order.objects.filter(id__in=ids).order_by('date', 'id').values_list(*ARCHIVE_FIELDS[:-1])
+            rows = [(*order, lines[order[0]]) for order in orders]
+            sink(rows)
+
+            # Cascades to the order lines; archived sales stay in the rollups
+            with keeping_deleted_orders():
+                Order.objects.filter(id__in=ids).delete()
+            # Batches go oldest first, so the last row is the newest archived
+            advance_watermark(rows[-1][ARCHIVE_FIELDS.index('date')])
+        archived += len(ids)
+        if pause:
+            # Give queued writers the lock between batches
+            time.sleep(pause)
+
+
+def purge_idle_carts(before, batch_size=RETENTION_BATCH_SIZE, pause=0):
+    """Delete cart lines last updated before ``before``; returns how many."""
+    purged = 0
+    while True:
+        with transaction.atomic():
+            ids = list(Cart.objects.filter(updated__lt=before).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return purged
+            Cart.objects.filter(id__in=ids).delete()
+        purged += len(ids)
+        if pause:
+            time.sleep(pause)
+
+
+def _pragma(cursor, name):
+    cursor.execute(f'PRAGMA {name}')
+    return cursor.fetchone()[0]
+
+
+def enable_incremental_vacuum(using=None):
+    """Switch the SQLite database to ``auto_vacuum=INCREMENTAL``.
+
+    Takes effect through one full ``VACUUM``, which rewrites the whole
+    file and locks it meanwhile; run it once, off-peak. Returns False for
+    other databases.
+    """
+    connection = connections[using or router.db_for_write(Order)]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+    return True
+
+
+def incremental_vacuum(pages, using=None):
+    """Return up to ``pages`` free pages to the filesystem.
+
+    Returns the number of pages freed, or None when the database is not
+    SQLite in ``auto_vacuum=INCREMENTAL`` mode.
+    """
+    connection = connections[using or router.db_for_write(Order)]
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        # 2 = INCREMENTAL
+        if _pragma(cursor, 'auto_vacuum') != 2:
+            return None
+        if connection.in_atomic_block:
+            # executescript() would commit the open transaction
+            raise TransactionManagementError('incremental_vacuum() cannot run inside a transaction.')
+        before = _pragma(cursor, 'freelist_count')
+        # The pragma frees one page per step; execute() only takes the first
+        # step, executescript() runs it to completion
+        cursor.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+        return before - _pragma(cursor, 'freelist_count')
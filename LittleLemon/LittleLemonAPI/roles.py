@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import cache
+
+MANAGER = 'Manager'
+DELIVERY_CREW = 'Delivery Crew'
+STAFF_ROLES = frozenset([MANAGER, DELIVERY_CREW])
+
+# Attribute used to memoize roles on the user object for the current request
+_REQUEST_ATTR = '_littlelemon_roles'
+
+
+def _cache_key(user_id):
+    return f'littlelemon:roles:{user_id}'
+
+
+def _cache_ttl():
+    return getattr(settings, 'LITTLELEMON_ROLE_CACHE_TTL', 0)
+
+
+def get_user_roles(user):
+    """Return the names of the groups ``user`` belongs to as a frozenset.
+
+    Roles are loaded at most once per request. When
+    ``LITTLELEMON_ROLE_CACHE_TTL`` is set they are also shared across
+    requests through the cache for that many seconds.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, _REQUEST_ATTR, None)
+    if roles is not None:
+        return roles
+
+    ttl = _cache_ttl()
+    if ttl:
+        roles = cache.get(_cache_key(user.pk))
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        if ttl:
+            cache.set(_cache_key(user.pk), roles, ttl)
+
+    set_request_roles(user, roles)
+    return roles
+
+
+async def aget_user_roles(user):
+    """Async counterpart of ``get_user_roles``."""
+    if not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, _REQUEST_ATTR, None)
+    if roles is not None:
+        return roles
+
+    ttl = _cache_ttl()
+    if ttl:
+        roles = await cache.aget(_cache_key(user.pk))
+    if roles is None:
+        roles = frozenset([name async for name in user.groups.values_list('name', flat=True)])
+        if ttl:
+            await cache.aset(_cache_key(user.pk), roles, ttl)
+
+    set_request_roles(user, roles)
+    return roles
+
+
+def set_request_roles(user, roles):
+    """Memoize ``roles`` on ``user`` for the rest of the request."""
+    setattr(user, _REQUEST_ATTR, roles)
+
+
+def invalidate_user_roles(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def is_manager(user):
+    return MANAGER in get_user_roles(user)
+
+
+def is_delivery_crew(user):
+    return DELIVERY_CREW in get_user_roles(user)
+
+
+def is_customer(user):
+    return not (get_user_roles(user) & STAFF_ROLES)
@@ -0,0 +1,70 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import MenuItemSearchIndex
+
+FTS_TABLE = MenuItemSearchIndex._meta.db_table
+
+# The trigram tokenizer cannot match terms shorter than this
+MIN_INDEXED_TERM = 3
+
+_fts_tables = {}
+
+
+def fts_available(using):
+    """Whether the SQLite FTS5 index created by migration 0003 exists."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (using, str(connection.settings_dict['NAME']))
+    if key not in _fts_tables:
+        _fts_tables[key] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[key]
+
+
+def search_terms(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def _contains_filter(terms):
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(category__title__icontains=term)
+    return condition
+
+
+def search_menu_items(queryset, text, ranked=False):
+    """Filter ``queryset`` to menu items matching every term in ``text``.
+
+    Terms match anywhere in the item or category title. When the FTS5
+    index is available it narrows the candidates and, with ``ranked``, the
+    results are ordered best match first; terms too short for the trigram
+    index are then checked against the narrowed rows only.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset.filter(_contains_filter([text]))
+
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_TERM]
+    short = [term for term in terms if len(term) < MIN_INDEXED_TERM]
+    if not indexed or not fts_available(queryset.db):
+        return queryset.filter(_contains_filter(terms))
+
+    fts = connections[queryset.db].ops.quote_name(FTS_TABLE)
+    match = ' AND '.join(f'"{term}"' for term in indexed)
+    # Join the index (the table keeps its own name as the first join's
+    # alias), then MATCH and rank against it
+    queryset = queryset.filter(
+        RawSQL(f'{fts} MATCH %s', [match], output_field=BooleanField()),
+        search_index__isnull=False,
+    )
+    if short:
+        queryset = queryset.filter(_contains_filter(short))
+    if ranked:
+        queryset = queryset.annotate(
+            search_rank=RawSQL(f'bm25({fts})', [], output_field=FloatField())
+        ).order_by('search_rank', 'id')
+    return queryset
@@ -1,13 +1,22 @@
 from rest_framework import serializers
-from .models import MenuItem, Category, Cart, Order, OrderItem
+from .instrumentation import serializer_timer
+from .lifecycle import CREW_STATUS_MESSAGE, CREW_STATUSES, TRANSITION_BATCH_LIMIT
+from .models import MenuItem, Category, Cart, Order, OrderItem, OrderStatus
+from .roles import MANAGER, get_user_roles
 from django.contrib.auth.models import User
 
-class CategorySerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    # Charges serialization to the request's Server-Timing/metrics
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'slug', 'title']
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.IntegerField(write_only=True)
 
@@ -15,7 +24,7 @@ class MenuItemSerializer(serializers.ModelSerializer):
         model = MenuItem
         fields = ['id', 'title', 'price', 'featured', 'category', 'category_id']
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     menuitem = MenuItemSerializer(read_only=True)
     menuitem_id = serializers.IntegerField(write_only=True)
     
@@ -27,21 +36,46 @@ class CartSerializer(serializers.ModelSerializer):
             'unit_price': {'read_only': True}
         }
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     menuitem = MenuItemSerializer(read_only=True)
 
     class Meta:
         model = OrderItem
         fields = ['menuitem', 'quantity', 'price']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     orderitem_set = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
         fields = ['id', 'user', 'delivery_crew', 'status', 'total', 'date', 'orderitem_set']
+        # Set from the cart when the order is placed; the sales rollups count them
+        extra_kwargs = {
+            'user': {'read_only': True},
+            'total': {'read_only': True}
+        }
+
+    def validate_status(self, value):
+        if self.instance is not None and value != self.instance.status:
+            if not OrderStatus.can_transition(self.instance.status, value):
+                raise serializers.ValidationError(
+                    f'Cannot move an order from {OrderStatus(self.instance.status).label} '
+                    f'to {OrderStatus(value).label}.'
+                )
+            # The same rule as the bulk transition action
+            request = self.context.get('request')
+            roles = get_user_roles(request.user) if request is not None else {MANAGER}
+            if MANAGER not in roles and value not in CREW_STATUSES:
+                raise serializers.ValidationError(CREW_STATUS_MESSAGE)
+        return value
+
+class OrderTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=TRANSITION_BATCH_LIMIT
+    )
+    status = serializers.ChoiceField(choices=OrderStatus.choices)
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email']
\ No newline at end of file
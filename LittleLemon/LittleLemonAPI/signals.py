@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .analytics import forget_order_lines, forget_orders, keeps_deleted_orders
+from .authentication import invalidate_tokens, invalidate_user_tokens
+from .catalog import bump_catalog_version
+from .models import Category, MenuItem, Order, OrderItem
+from .roles import invalidate_user_roles
+
+
+def _invalidate_user_auth(*user_ids):
+    # Cached tokens carry the user's roles, so both caches go together
+    invalidate_user_roles(*user_ids)
+    invalidate_user_tokens(*user_ids)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add(...) / remove(...) / clear()
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _invalidate_user_auth(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # group.user_set.add(...) / remove(...)
+        _invalidate_user_auth(*pk_set)
+    elif action == 'pre_clear':
+        # group.user_set.clear() does not report which users it removes
+        _invalidate_user_auth(*instance.user_set.values_list('pk', flat=True))
+
+
+# Saves that change these must stop cached tokens from authenticating
+TOKEN_FIELDS = frozenset(['is_active', 'password'])
+
+
+@receiver(pre_save, sender=User)
+def note_token_field_changes(sender, instance, update_fields, **kwargs):
+    # Logins save last_login alone; they must not flush the token cache
+    if instance.pk is None or (update_fields is not None and not TOKEN_FIELDS & update_fields):
+        instance._token_fields_changed = False
+        return
+    saved = sender.objects.filter(pk=instance.pk).values(*TOKEN_FIELDS).first()
+    instance._token_fields_changed = saved is not None and any(
+        saved[field] != getattr(instance, field) for field in TOKEN_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_tokens_on_user_change(sender, instance, created, **kwargs):
+    if not created and instance.__dict__.pop('_token_fields_changed', False):
+        invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token_on_delete(sender, instance, **kwargs):
+    # djoser's token/logout deletes the token
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_catalog_version_on_change(sender, **kwargs):
+    bump_catalog_version()
+
+
+# Every delete path: the API, the admin, queryset.delete() and cascades from users
+@receiver(pre_delete, sender=Order)
+def forget_deleted_order(sender, instance, **kwargs):
+    if not keeps_deleted_orders():
+        forget_orders(Order.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_delete, sender=MenuItem)
+def forget_order_lines_of_deleted_menuitem(sender, instance, **kwargs):
+    forget_order_lines(OrderItem.objects.filter(menuitem=instance))
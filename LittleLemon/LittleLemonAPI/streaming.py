@@ -0,0 +1,87 @@
+"""Helpers for streaming CSV/NDJSON request and response bodies."""
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .renderers import CSVRenderer, NDJSONRenderer
+
+CSV_MEDIA_TYPES = ('text/csv',)
+NDJSON_MEDIA_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/ndjson')
+
+
+class _Echo:
+    # File-like object whose write() hands the line back to the generator
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header).encode()
+    for row in rows:
+        yield writer.writerow(row).encode()
+
+
+def ndjson_lines(header, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        yield (encoder.encode(dict(zip(header, row))) + '\n').encode()
+
+
+def streaming_export(request, header, rows, filename):
+    """Stream ``rows`` as CSV or NDJSON, following the negotiated renderer."""
+    if request.accepted_renderer.format == NDJSONRenderer.format:
+        lines, renderer = ndjson_lines(header, rows), NDJSONRenderer
+    else:
+        lines, renderer = csv_lines(header, rows), CSVRenderer
+    response = StreamingHttpResponse(lines, content_type=f'{renderer.media_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{renderer.format}"'
+    return response
+
+
+def iter_upload_rows(request):
+    """Yield ``(line_number, dict)`` from a CSV or NDJSON request body.
+
+    The body is decoded incrementally from ``request.stream``, so large
+    uploads are never held in memory. NDJSON lines that are not JSON
+    objects are yielded as None. Returns None for other content types.
+    """
+    media_type = request.content_type.split(';')[0].strip().lower()
+    if media_type in CSV_MEDIA_TYPES:
+        return _iter_csv(_text_lines(request.stream))
+    if media_type in NDJSON_MEDIA_TYPES:
+        return _iter_ndjson(_text_lines(request.stream))
+    return None
+
+
+def _text_lines(stream):
+    if stream is None:
+        return
+    yield from codecs.iterdecode(stream, 'utf-8-sig')
+
+
+def _iter_csv(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _iter_ndjson(lines):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
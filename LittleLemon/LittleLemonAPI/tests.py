@@ -1,11 +1,44 @@
-from django.test import TestCase
-from django.contrib.auth.models import User, Group
+import asyncio
+import base64
+import heapq
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from unittest import mock
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User, Group, update_last_login
+from django.core.cache import cache
+from django.utils import timezone
+from django.core.management import CommandError, call_command
 from rest_framework.test import APIClient
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
 from rest_framework import status
-from .models import MenuItem, Category, Order
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from LittleLemon.middleware import ReadReplicaMiddleware, RequestMetricsMiddleware
+from .db import ReadReplicaRouter, apply_sqlite_pragmas
+from .instrumentation import registry
+from .models import ArchivedOrder, MenuItem, Category, Cart, CatalogVersion, DailySales, Order, OrderItem, OrderStatus
+from .notifier import notifier
+from .read_serializers import read_serializer
+from .renderers import FastJSONRenderer
+from .serializers import CartSerializer, CategorySerializer, MenuItemSerializer, OrderSerializer
+from .throttling import RoleRateThrottle, TokenBucketThrottle
 
 class LittleLemonAPITests(TestCase):
     def setUp(self):
+        cache.clear()
+
         # Create test groups
         manager_group, _ = Group.objects.get_or_create(name='Manager')
         delivery_group, _ = Group.objects.get_or_create(name='Delivery Crew')
@@ -67,4 +100,1769 @@ class LittleLemonAPITests(TestCase):
             'category_id': self.category.id
         }
         response = self.customer_client.post('/api/menu-items/', data)
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+@override_settings(LITTLELEMON_ROLE_CACHE_TTL=0)
+class OrderQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.customer_user = User.objects.create_user(
+            username='customer', 
+            password='customerpass'
+        )
+        self.category = Category.objects.create(
+            slug='test-category', 
+            title='Test Category'
+        )
+        self.menu_items = [
+            MenuItem.objects.create(
+                title=f'Menu Item {i}',
+                price=5.00 + i,
+                category=self.category
+            )
+            for i in range(5)
+        ]
+
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(user=self.customer_user, total=0)
+            for menu_item in self.menu_items:
+                OrderItem.objects.create(
+                    order=order,
+                    menuitem=menu_item,
+                    quantity=1,
+                    price=menu_item.price
+                )
+
+    def count_queries(self, path):
+        # Authenticate a fresh instance so no per-request state carries over
+        self.customer_client.force_authenticate(
+            user=User.objects.get(pk=self.customer_user.pk)
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.customer_client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_order_list_query_count_is_constant(self):
+        self.create_orders(1)
+        baseline = self.count_queries('/api/orders/')
+
+        self.create_orders(20)
+        self.assertEqual(self.count_queries('/api/orders/'), baseline)
+
+    def test_order_retrieve_query_count_is_constant(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        baseline = self.count_queries(f'/api/orders/{order.id}/')
+
+        self.menu_items.extend(
+            MenuItem.objects.create(
+                title=f'Extra Item {i}',
+                price=1.00,
+                category=self.category
+            )
+            for i in range(10)
+        )
+        for menu_item in self.menu_items[5:]:
+            OrderItem.objects.create(
+                order=order,
+                menuitem=menu_item,
+                quantity=1,
+                price=menu_item.price
+            )
+        self.assertEqual(self.count_queries(f'/api/orders/{order.id}/'), baseline)
+
+
+class RoleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.manager_group, _ = Group.objects.get_or_create(name='Manager')
+        self.admin_user = User.objects.create_user(
+            username='admin', 
+            password='adminpass'
+        )
+        self.admin_user.groups.add(self.manager_group)
+        self.manager_user = User.objects.create_user(
+            username='manager', 
+            password='managerpass'
+        )
+
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(user=self.admin_user)
+
+    def client_for(self, user):
+        # A fresh user instance per request, as authentication would load
+        client = APIClient()
+        client.force_authenticate(user=User.objects.get(pk=user.pk))
+        return client
+
+    def test_combined_permissions_load_groups_once(self):
+        order = Order.objects.create(user=self.admin_user, total=0)
+        with CaptureQueriesContext(connection) as context:
+            response = self.admin_client.patch(
+                f'/api/orders/{order.id}/', {'status': OrderStatus.PREPARING}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order.refresh_from_db()
+        self.assertEqual(order.status, OrderStatus.PREPARING)
+        group_queries = [
+            query for query in context.captured_queries
+            if 'auth_user_groups' in query['sql']
+        ]
+        self.assertEqual(len(group_queries), 1)
+
+    def test_cached_roles_are_shared_between_requests(self):
+        self.client_for(self.admin_user).get('/api/categories/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client_for(self.admin_user).get('/api/categories/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any(
+            'auth_user_groups' in query['sql'] for query in context.captured_queries
+        ))
+
+    def test_group_management_invalidates_cached_roles(self):
+        response = self.client_for(self.manager_user).get('/api/categories/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.admin_client.post('/api/groups/manager/users', {'username': 'manager'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client_for(self.manager_user).get('/api/categories/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.admin_client.delete(f'/api/groups/manager/users/{self.manager_user.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client_for(self.manager_user).get('/api/categories/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(LITTLELEMON_ROLE_CACHE_TTL=0)
+class OrderCreateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.customer_user = User.objects.create_user(
+            username='customer', 
+            password='customerpass'
+        )
+        self.category = Category.objects.create(
+            slug='test-category', 
+            title='Test Category'
+        )
+        self.menu_items = [
+            MenuItem.objects.create(
+                title=f'Menu Item {i}',
+                price=2.50,
+                category=self.category
+            )
+            for i in range(20)
+        ]
+
+    def fill_cart(self, size):
+        for menu_item in self.menu_items[:size]:
+            Cart.objects.create(
+                user=self.customer_user,
+                menuitem=menu_item,
+                quantity=2,
+                unit_price=menu_item.price,
+                price=menu_item.price * 2
+            )
+
+    def place_order(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.get(pk=self.customer_user.pk))
+        with CaptureQueriesContext(connection) as context:
+            response = client.post('/api/orders/')
+        return response, len(context.captured_queries)
+
+    def test_order_moves_cart_into_order_items(self):
+        self.fill_cart(3)
+        response, _ = self.place_order()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total'], '15.00')
+        self.assertEqual(len(response.data['orderitem_set']), 3)
+        self.assertEqual(OrderItem.objects.filter(order_id=response.data['id']).count(), 3)
+        self.assertFalse(Cart.objects.filter(user=self.customer_user).exists())
+
+    def test_empty_cart_is_rejected(self):
+        response, _ = self.place_order()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        self.fill_cart(1)
+        _, baseline = self.place_order()
+        self.fill_cart(20)
+        response, queries = self.place_order()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(queries, baseline)
+
+
+class CatalogConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        manager_group, _ = Group.objects.get_or_create(name='Manager')
+        self.manager_user = User.objects.create_user(
+            username='manager', 
+            password='managerpass'
+        )
+        self.manager_user.groups.add(manager_group)
+        self.category = Category.objects.create(
+            slug='test-category', 
+            title='Test Category'
+        )
+        self.menu_item = MenuItem.objects.create(
+            title='Test Menu Item',
+            price=10.00,
+            category=self.category
+        )
+
+        self.manager_client = APIClient()
+        self.manager_client.force_authenticate(user=self.manager_user)
+
+    def test_matching_etag_returns_not_modified_without_serializing(self):
+        response = self.manager_client.get('/api/menu-items/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.manager_client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(any(
+            'LittleLemonAPI_menuitem' in query['sql'] for query in context.captured_queries
+        ))
+
+    def test_etag_differs_per_query_and_resource(self):
+        etags = {
+            self.manager_client.get(path)['ETag']
+            for path in [
+                '/api/menu-items/',
+                '/api/menu-items/?sort=price',
+                f'/api/menu-items/{self.menu_item.id}/',
+                '/api/categories/',
+            ]
+        }
+        self.assertEqual(len(etags), 4)
+
+    def test_menu_changes_invalidate_etag(self):
+        etag = self.manager_client.get('/api/categories/')['ETag']
+
+        self.manager_client.patch(f'/api/menu-items/{self.menu_item.id}/', {'price': 12})
+        response = self.manager_client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Last-Modified', response)
+
+
+class MenuListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        manager_group, _ = Group.objects.get_or_create(name='Manager')
+        self.manager_user = User.objects.create_user(
+            username='manager', 
+            password='managerpass'
+        )
+        self.manager_user.groups.add(manager_group)
+        self.customer_user = User.objects.create_user(
+            username='customer', 
+            password='customerpass'
+        )
+        self.category = Category.objects.create(
+            slug='test-category', 
+            title='Test Category'
+        )
+        self.menu_item = MenuItem.objects.create(
+            title='Test Menu Item',
+            price=10.00,
+            category=self.category
+        )
+
+        self.manager_client = APIClient()
+        self.manager_client.force_authenticate(user=self.manager_user)
+
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+
+    def test_repeated_list_is_served_from_cache(self):
+        first = self.customer_client.get('/api/menu-items/?sort=price')
+        with CaptureQueriesContext(connection) as context:
+            second = self.customer_client.get('/api/menu-items/?sort=price&page=1')
+        self.assertEqual(second.data, first.data)
+        self.assertFalse(any(
+            'LittleLemonAPI_menuitem' in query['sql'] for query in context.captured_queries
+        ))
+
+        stats = self.manager_client.get('/api/menu-items/cache-stats/').data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_menu_changes_evict_cached_pages(self):
+        self.customer_client.get('/api/menu-items/')
+        self.manager_client.patch(f'/api/menu-items/{self.menu_item.id}/', {'title': 'Renamed'})
+
+        response = self.customer_client.get('/api/menu-items/')
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+
+        self.category.title = 'Renamed Category'
+        self.category.save()
+        response = self.customer_client.get('/api/menu-items/')
+        self.assertEqual(response.data['results'][0]['category']['title'], 'Renamed Category')
+
+    def test_padded_params_do_not_share_a_cache_entry(self):
+        padded = self.customer_client.get('/api/menu-items/', {'category': 'test-category '})
+        self.assertEqual(padded.data['count'], 0)
+        response = self.customer_client.get('/api/menu-items/', {'category': 'test-category'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_customer_cannot_read_cache_stats(self):
+        response = self.customer_client.get('/api/menu-items/cache-stats/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class MenuSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.customer_user = User.objects.create_user(
+            username='customer', 
+            password='customerpass'
+        )
+        self.mains = Category.objects.create(slug='mains', title='Mains')
+        self.desserts = Category.objects.create(slug='desserts', title='Desserts')
+        for title, category in [
+            ('Greek Salad', self.mains),
+            ('Lemon Chicken', self.mains),
+            ('Lemon Dessert', self.desserts),
+            ('Lemon Lemon Tart', self.desserts),
+        ]:
+            MenuItem.objects.create(title=title, price=8.00, category=category)
+
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+
+    def search(self, text, **params):
+        response = self.customer_client.get('/api/menu-items/', {'search': text, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['title'] for item in response.data['results']]
+
+    def test_search_matches_substrings_of_item_and_category_titles(self):
+        self.assertEqual(self.search('sala'), ['Greek Salad'])
+        self.assertCountEqual(
+            self.search('dessert'), ['Lemon Dessert', 'Lemon Lemon Tart']
+        )
+
+    def test_multi_term_search_requires_every_term(self):
+        self.assertEqual(self.search('lemon chick'), ['Lemon Chicken'])
+        self.assertEqual(self.search('lemon ta'), ['Lemon Lemon Tart'])
+
+    def test_terms_may_match_across_item_and_category_titles(self):
+        # Before the FTS index the whole text had to appear in one title;
+        # now each term is matched on its own, in either title
+        self.assertEqual(self.search('chicken mains'), ['Lemon Chicken'])
+        self.assertEqual(self.search('tart lemon'), ['Lemon Lemon Tart'])
+        self.assertEqual(self.search('mains chicken', sort='price'), ['Lemon Chicken'])
+
+    def test_ranked_unless_sorted(self):
+        self.assertEqual(self.search('lemon')[0], 'Lemon Lemon Tart')
+        self.assertEqual(len(self.search('lemon', sort='-price')), 3)
+
+    def test_index_follows_menu_and_category_changes(self):
+        item = MenuItem.objects.get(title='Greek Salad')
+        item.title = 'Garden Salad'
+        item.save()
+        self.mains.title = 'Entrees'
+        self.mains.save()
+
+        self.assertEqual(self.search('garden'), ['Garden Salad'])
+        self.assertEqual(self.search('greek'), [])
+        self.assertCountEqual(self.search('entrees'), ['Garden Salad', 'Lemon Chicken'])
+
+        item.delete()
+        self.assertEqual(self.search('garden'), [])
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        output = StringIO()
+        call_command('check_query_plans', '-v', '2', stdout=output)
+        self.assertNotIn('FULL SCAN', output.getvalue())
+
+    def test_queries_come_from_the_view_helpers(self):
+        from .query_plans import representative_queries
+        from .search import FTS_TABLE
+
+        queries = {name: str(queryset.query) for name, queryset, _ in representative_queries()}
+        self.assertIn(FTS_TABLE, queries['menu-items: search'])
+        self.assertIn('orders: delivery feed', queries)
+        self.assertIn('orders: export', queries)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.customer_user = User.objects.create_user(
+            username='customer', 
+            password='customerpass'
+        )
+        self.category = Category.objects.create(
+            slug='test-category', 
+            title='Test Category'
+        )
+        for i in range(25):
+            MenuItem.objects.create(
+                title=f'Menu Item {i}',
+                price=5 + i % 4,
+                category=self.category
+            )
+            Order.objects.create(user=self.customer_user, total=i)
+
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+
+    def walk(self, url):
+        pages = []
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.customer_client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            self.assertFalse(any(
+                'COUNT(' in query['sql'] for query in context.captured_queries
+            ))
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def test_orders_walk_every_row_once_newest_first(self):
+        pages = self.walk('/api/orders/?pagination=keyset')
+        ids = [order['id'] for page in pages for order in page['results']]
+        self.assertEqual([len(page['results']) for page in pages], [10, 10, 5])
+        self.assertEqual(ids, sorted(Order.objects.values_list('id', flat=True), reverse=True))
+
+    def test_previous_link_returns_the_earlier_page(self):
+        first = self.customer_client.get('/api/orders/?pagination=keyset').data
+        self.assertIsNone(first['previous'])
+        second = self.customer_client.get(first['next']).data
+        back = self.customer_client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+
+    def test_menu_items_follow_price_sort_with_ties(self):
+        pages = self.walk('/api/menu-items/?pagination=keyset&sort=-price')
+        rows = [(item['price'], item['id']) for page in pages for item in page['results']]
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(
+            rows,
+            sorted(rows, key=lambda row: (float(row[0]), row[1]), reverse=True)
+        )
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.customer_client.get('/api/orders/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_values_are_rejected(self):
+        def cursor(position):
+            payload = json.dumps({'p': position, 'r': 0}).encode()
+            return base64.urlsafe_b64encode(payload).decode()
+
+        cases = [
+            ('/api/orders/', ['notadate', 1]),
+            ('/api/orders/', [{'a': 1}, 1]),
+            ('/api/orders/', ['2024-01-01', 'x']),
+            ('/api/orders/', [None, 1]),
+            ('/api/menu-items/', ['abc', 1]),
+            ('/api/menu-items/', ['NaN', 1]),
+            ('/api/menu-items/', [[1], 1]),
+        ]
+        for url, position in cases:
+            with self.subTest(url=url, position=position):
+                response = self.customer_client.get(f'{url}?cursor={cursor(position)}')
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_pagination_remains_the_default(self):
+        response = self.customer_client.get('/api/orders/')
+        self.assertEqual(response.data['count'], 25)
+
+
+class BenchmarkBaselineTests(TestCase):
+    def test_regressions_flag_extra_queries_and_slowdowns(self):
+        from .benchmarks import regressions
+
+        baseline = {'endpoints': {
+            'GET cart': {'p50_ms': 2.0, 'queries': 3},
+            'GET orders': {'p50_ms': 4.0, 'queries': 4},
+        }}
+        results = {'endpoints': {
+            'GET cart': {'p50_ms': 2.2, 'queries': 4},
+            'GET orders': {'p50_ms': 6.0, 'queries': 4},
+            'GET new': {'p50_ms': 50.0, 'queries': 40},
+        }}
+        found = regressions(results, baseline, tolerance=0.25)
+        self.assertEqual(len(found), 2)
+        self.assertIn('GET cart: queries', found[0])
+        self.assertIn('GET orders: p50', found[1])
+
+    def test_scenarios_each_start_from_an_empty_database(self):
+        # A separate process: the command sets up its own test database,
+        # which cannot be nested inside this test run's
+        manage = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'manage.py')
+        result = subprocess.run(
+            [sys.executable, manage, 'benchmark', 'order-create', 'menu-search',
+             '--repeat', '1', '--cart-sizes', '1', '--menu-sizes', '50'],
+            capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('1 cart lines', result.stdout)
+        self.assertIn("50 items, 'lemon'", result.stdout)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+        manager_group, _ = Group.objects.get_or_create(name='Manager')
+        self.manager_user = User.objects.create_user(
+            username='manager', 
+            password='managerpass'
+        )
+        self.manager_user.groups.add(manager_group)
+        self.customer_user = User.objects.create_user(
+            username='customer', 
+            password='customerpass'
+        )
+        category = Category.objects.create(slug='test-category', title='Test Category')
+        MenuItem.objects.create(title='Test Menu Item', price=10.00, category=category)
+
+        self.manager_client = APIClient()
+        self.manager_client.force_authenticate(user=self.manager_user)
+
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+
+    def test_responses_carry_server_timing(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.customer_client.get('/api/menu-items/')
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(context.captured_queries)} queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_metrics_endpoint_aggregates_per_view(self):
+        self.customer_client.get('/api/menu-items/')
+        self.customer_client.get('/api/menu-items/')
+
+        response = self.manager_client.get('/api/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn(
+            'littlelemon_request_duration_seconds_count{view="menuitem-list",method="GET"} 2',
+            body
+        )
+        self.assertIn(
+            'littlelemon_responses_total{view="menuitem-list",method="GET",status="200"} 2',
+            body
+        )
+
+    def test_metrics_endpoint_is_manager_only(self):
+        response = self.customer_client.get('/api/metrics')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_streamed_responses_are_recorded_when_the_body_closes(self):
+        response = self.manager_client.get('/api/menu-items/export/', {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        count = 'littlelemon_request_duration_seconds_count{view="menuitem-export",method="GET"} 1'
+        self.assertNotIn(count, registry.render_prometheus())
+
+        before_body = int(re.search(r'desc="(\d+) queries"', response['Server-Timing'])[1])
+        b''.join(response.streaming_content)
+        body = registry.render_prometheus()
+        self.assertIn(count, body)
+        # The export query runs while the body streams
+        self.assertIn(
+            f'littlelemon_request_sql_queries_sum{{view="menuitem-export",method="GET"}} {before_body + 1}.000000',
+            body
+        )
+
+    def test_async_streams_are_charged_their_queries(self):
+        async def events():
+            yield b'first\n'
+            yield f'{await MenuItem.objects.acount()}\n'.encode()
+
+        async def view(request):
+            return StreamingHttpResponse(events())
+
+        # Built here so it hooks this thread's connection, as at startup
+        middleware = RequestMetricsMiddleware(view)
+
+        async def stream():
+            response = await middleware(RequestFactory().get('/events'))
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(async_to_sync(stream)(), b'first\n1\n')
+        self.assertIn(
+            'littlelemon_request_sql_queries_sum{view="unmatched",method="GET"} 1.000000',
+            registry.render_prometheus()
+        )
+
+
+@override_settings(LITTLELEMON_ROLE_CACHE_TTL=0)
+class AsyncReadPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        delivery_group, _ = Group.objects.get_or_create(name='Delivery Crew')
+        self.delivery_user = User.objects.create_user(
+            username='delivery', 
+            password='deliverypass'
+        )
+        self.delivery_user.groups.add(delivery_group)
+        self.customer_user = User.objects.create_user(
+            username='customer', 
+            password='customerpass'
+        )
+        self.category = Category.objects.create(
+            slug='test-category', 
+            title='Test Category'
+        )
+        self.menu_items = [
+            MenuItem.objects.create(
+                title=f'Menu Item {i}',
+                price=3.25 + i,
+                category=self.category
+            )
+            for i in range(12)
+        ]
+        for menu_item in self.menu_items[:3]:
+            Cart.objects.create(
+                user=self.customer_user,
+                menuitem=menu_item,
+                quantity=2,
+                unit_price=menu_item.price,
+                price=menu_item.price * 2
+            )
+        order = Order.objects.create(
+            user=self.customer_user, 
+            delivery_crew=self.delivery_user,
+            total=20
+        )
+        OrderItem.objects.create(
+            order=order, menuitem=self.menu_items[0], quantity=1, price=3.25
+        )
+
+        self.customer_token = Token.objects.create(user=self.customer_user).key
+        self.delivery_token = Token.objects.create(user=self.delivery_user).key
+
+    def drf_get(self, path, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return client.get(path)
+
+    async def async_get(self, path, token=None):
+        headers = {'Authorization': f'Token {token}'} if token else {}
+        return await self.async_client.get(path, headers=headers)
+
+    async def assert_same_response(self, path, token):
+        expected = await sync_to_async(self.drf_get)(f'/api/{path}', token)
+        response = await self.async_get(f'/api/async/{path}', token)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content.replace(b'/api/', b'/api/async/'))
+
+    async def test_menu_item_responses_match_drf(self):
+        await self.assert_same_response('menu-items/', self.customer_token)
+        await self.assert_same_response('menu-items/?page=2', self.customer_token)
+        await self.assert_same_response('menu-items/?sort=-price&search=item', self.customer_token)
+        await self.assert_same_response(f'menu-items/{self.menu_items[0].id}/', self.customer_token)
+
+    async def test_cart_and_order_responses_match_drf(self):
+        await self.assert_same_response('cart/', self.customer_token)
+        await self.assert_same_response('orders/', self.customer_token)
+        await self.assert_same_response('orders/', self.delivery_token)
+
+    async def test_later_pages_match_drf(self):
+        for total in range(25, 0, -1):
+            order = await Order.objects.acreate(user=self.customer_user, total=total)
+            await OrderItem.objects.acreate(
+                order=order, menuitem=self.menu_items[total % 12], quantity=1, price=total
+            )
+        for page in ['2', '3', 'last']:
+            await self.assert_same_response(f'orders/?page={page}', self.customer_token)
+            await self.assert_same_response(f'menu-items/?page={page}', self.customer_token)
+
+    async def test_authentication_and_roles_are_enforced(self):
+        response = await self.async_get('/api/async/menu-items/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_get('/api/async/cart/', self.delivery_token)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = await self.async_get('/api/async/menu-items/?page=9', self.customer_token)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CartUpsertTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.customer_user = User.objects.create_user(
+            username='customer', 
+            password='customerpass'
+        )
+        self.category = Category.objects.create(
+            slug='test-category', 
+            title='Test Category'
+        )
+        self.salad = MenuItem.objects.create(title='Salad', price=4.50, category=self.category)
+        self.soup = MenuItem.objects.create(title='Soup', price=3.10, category=self.category)
+
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+
+    def add(self, data):
+        return self.customer_client.post('/api/cart/', data, format='json')
+
+    def test_repeated_adds_accumulate_in_one_line(self):
+        response = self.add({'menuitem_id': self.salad.id, 'quantity': 2})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['quantity'], 2)
+        self.assertEqual(response.data['price'], '9.00')
+
+        response = self.add({'menuitem_id': self.salad.id, 'quantity': 1})
+        self.assertEqual(response.data['quantity'], 3)
+        self.assertEqual(response.data['price'], '13.50')
+        self.assertEqual(response.data['menuitem']['title'], 'Salad')
+        self.assertEqual(Cart.objects.filter(user=self.customer_user).count(), 1)
+
+    def test_add_is_a_single_write(self):
+        self.add({'menuitem_id': self.salad.id, 'quantity': 1})
+        with CaptureQueriesContext(connection) as context:
+            self.add({'menuitem_id': self.salad.id, 'quantity': 1})
+        writes = [
+            query for query in context.captured_queries
+            if query['sql'].lstrip().startswith(('INSERT', 'UPDATE'))
+        ]
+        self.assertEqual(len(writes), 1)
+
+    def test_batch_of_lines(self):
+        self.add({'menuitem_id': self.soup.id, 'quantity': 1})
+        response = self.add([
+            {'menuitem_id': self.salad.id, 'quantity': 1},
+            {'menuitem_id': self.soup.id, 'quantity': 2},
+            {'menuitem_id': self.salad.id, 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(line['menuitem']['title'], line['quantity'], line['price']) for line in response.data],
+            [('Salad', 2, '9.00'), ('Soup', 3, '9.30')]
+        )
+
+    def test_unknown_menu_item_rolls_back_the_batch(self):
+        response = self.add([
+            {'menuitem_id': self.salad.id, 'quantity': 1},
+            {'menuitem_id': 9999, 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Cart.objects.exists())
+
+    def test_empty_batch_is_rejected(self):
+        response = self.add([])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MenuImportExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.manager_user = User.objects.create_user(
+            username='manager', 
+            password='managerpass'
+        )
+        self.manager_user.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        self.customer_user = User.objects.create_user(
+            username='customer', 
+            password='customerpass'
+        )
+        self.category = Category.objects.create(
+            slug='mains', 
+            title='Mains'
+        )
+        Category.objects.create(slug='desserts', title='Desserts')
+        self.pasta = MenuItem.objects.create(title='Pasta', price=12.00, category=self.category)
+
+        self.manager_client = APIClient()
+        self.manager_client.force_authenticate(user=self.manager_user)
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+
+    def upload(self, body, content_type='text/csv'):
+        return self.manager_client.generic(
+            'POST', '/api/menu-items/import/', body.encode(), content_type=content_type
+        )
+
+    def test_csv_import_creates_and_updates(self):
+        body = (
+            'id,title,price,featured,category\n'
+            f'{self.pasta.id},Pasta al forno,13.50,,mains\n'
+            ',Tiramisu,6.00,true,desserts\n'
+        )
+        response = self.upload(body)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'created': 1, 'updated': 1})
+
+        self.pasta.refresh_from_db()
+        self.assertEqual((self.pasta.title, str(self.pasta.price)), ('Pasta al forno', '13.50'))
+        tiramisu = MenuItem.objects.get(title='Tiramisu')
+        self.assertTrue(tiramisu.featured)
+        self.assertEqual(tiramisu.category.slug, 'desserts')
+
+    def test_ndjson_import(self):
+        body = '{"title": "Gelato", "price": "4.00", "category": "desserts"}\n\n'
+        response = self.upload(body, 'application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(MenuItem.objects.filter(title='Gelato').exists())
+
+    def test_invalid_row_rejects_the_whole_import(self):
+        body = (
+            'title,price,category\n'
+            'Gelato,4.00,desserts\n'
+            'Mystery,abc,unknown\n'
+        )
+        response = self.upload(body)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        rows = response.json()['rows']
+        self.assertEqual([row['line'] for row in rows], [3])
+        self.assertEqual(set(rows[0]['errors']), {'price', 'category'})
+        self.assertFalse(MenuItem.objects.filter(title='Gelato').exists())
+
+    def test_import_bumps_catalog_version(self):
+        version = self.manager_client.get('/api/menu-items/')['ETag']
+        self.upload('title,price,category\nGelato,4.00,desserts\n')
+        self.assertNotEqual(self.manager_client.get('/api/menu-items/')['ETag'], version)
+
+    def test_import_rejects_other_media_types(self):
+        response = self.manager_client.post('/api/menu-items/import/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_csv_export_streams_every_item(self):
+        response = self.manager_client.get('/api/menu-items/export/?format=csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['id,title,price,featured,category', f'{self.pasta.id},Pasta,12.00,False,mains']
+        )
+
+    def test_ndjson_export_round_trips_through_import(self):
+        response = self.manager_client.get(
+            '/api/menu-items/export/', HTTP_ACCEPT='application/x-ndjson'
+        )
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(json.loads(body)['category'], 'mains')
+
+        response = self.upload(body, 'application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'created': 0, 'updated': 1})
+
+    def test_customers_cannot_import_or_export(self):
+        response = self.customer_client.get('/api/menu-items/export/?format=csv')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.customer_client.generic(
+            'POST', '/api/menu-items/import/', b'title\n', content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.manager_user = User.objects.create_user(
+            username='manager', 
+            password='managerpass'
+        )
+        self.manager_user.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        self.customer_user = User.objects.create_user(
+            username='customer', 
+            password='customerpass'
+        )
+        category = Category.objects.create(slug='mains', title='Mains')
+        pasta = MenuItem.objects.create(title='Pasta', price=12.00, category=category)
+        soup = MenuItem.objects.create(title='Soup', price=3.10, category=category)
+
+        self.orders = []
+        for day, items in [('2024-01-05', [pasta, soup]), ('2024-02-10', [soup])]:
+            order = Order.objects.create(user=self.customer_user, total=15.10, status=0)
+            Order.objects.filter(pk=order.pk).update(date=day)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, menuitem=item, quantity=1, price=item.price)
+                for item in items
+            )
+            self.orders.append(order)
+
+        self.manager_client = APIClient()
+        self.manager_client.force_authenticate(user=self.manager_user)
+
+    def export(self, **params):
+        response = self.manager_client.get('/api/orders/export/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_one_row_per_order_line(self):
+        lines = self.export(format='csv').splitlines()
+        self.assertEqual(lines[0], ','.join([
+            'order_id', 'date', 'customer', 'delivery_crew', 'status', 'order_total',
+            'menuitem_id', 'menuitem', 'quantity', 'price',
+        ]))
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith(f'{self.orders[0].id},2024-01-05,customer,,'))
+
+    def test_date_range_filter(self):
+        rows = [
+            json.loads(line) 
+            for line in self.export(format='ndjson', start='2024-02-01', end='2024-02-28').splitlines()
+        ]
+        self.assertEqual([(row['order_id'], row['menuitem']) for row in rows], [(self.orders[1].id, 'Soup')])
+
+    def test_export_is_one_query(self):
+        # The manager's role lookup, then the single joined export query
+        with self.assertNumQueries(2):
+            self.export(format='csv')
+
+    def test_invalid_dates_are_rejected(self):
+        response = self.manager_client.get('/api/orders/export/', {'format': 'csv', 'start': '2024-13-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('start', json.loads(response.content))
+
+    def test_customers_cannot_export(self):
+        client = APIClient()
+        client.force_authenticate(user=self.customer_user)
+        response = client.get('/api/orders/export/', {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SalesAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        manager_group, _ = Group.objects.get_or_create(name='Manager')
+        self.manager_user = User.objects.create_user(username='manager', password='managerpass')
+        self.manager_user.groups.add(manager_group)
+        self.customer_user = User.objects.create_user(username='customer', password='customerpass')
+
+        self.mains = Category.objects.create(slug='mains', title='Mains')
+        self.desserts = Category.objects.create(slug='desserts', title='Desserts')
+        self.pasta = MenuItem.objects.create(title='Pasta', price=12.00, category=self.mains)
+        self.cake = MenuItem.objects.create(title='Cake', price=5.00, category=self.desserts)
+
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+        self.manager_client = APIClient()
+        self.manager_client.force_authenticate(user=self.manager_user)
+
+    def place_order(self, lines):
+        self.customer_client.post('/api/cart/', [
+            {'menuitem_id': item.id, 'quantity': quantity} for item, quantity in lines
+        ], format='json')
+        response = self.customer_client.post('/api/orders/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def summary(self, **params):
+        response = self.manager_client.get('/api/analytics/sales', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def figures(self, data):
+        # Rows taken down to zero are kept; a rebuild leaves them out
+        return {
+            key: [row for row in value if row['quantity']] if key in ('categories', 'menu_items') else value
+            for key, value in data.items()
+        }
+
+    def test_orders_update_the_rollups(self):
+        self.place_order([(self.pasta, 2), (self.cake, 1)])
+        self.place_order([(self.cake, 3)])
+
+        data = self.summary()
+        self.assertEqual((data['orders'], data['items'], data['revenue']), (2, 6, '44.00'))
+        self.assertEqual(data['average_basket'], '22.00')
+        self.assertEqual(
+            [(row['title'], row['quantity'], row['revenue']) for row in data['categories']],
+            [('Mains', 2, '24.00'), ('Desserts', 4, '20.00')]
+        )
+        self.assertEqual([row['title'] for row in data['top_sellers']], ['Cake', 'Pasta'])
+
+    def test_summary_reads_only_the_rollups(self):
+        self.place_order([(self.pasta, 1)])
+        self.summary()
+        with CaptureQueriesContext(connection) as context:
+            self.summary()
+        tables = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertNotIn('"LittleLemonAPI_order"', tables)
+        self.assertNotIn('"LittleLemonAPI_orderitem"', tables)
+
+    def test_date_range(self):
+        self.place_order([(self.pasta, 1)])
+        self.assertEqual(self.summary(end='2000-01-01')['orders'], 0)
+        self.assertEqual(len(self.summary(start=date.today().isoformat())['days']), 1)
+
+    def test_deleting_an_order_takes_it_out(self):
+        order_id = self.place_order([(self.pasta, 1)])
+        self.place_order([(self.cake, 1)])
+        response = self.manager_client.delete(f'/api/orders/{order_id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        data = self.summary()
+        self.assertEqual((data['orders'], data['revenue']), (1, '5.00'))
+        self.assertEqual([row['title'] for row in data['menu_items'] if row['quantity']], ['Cake'])
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        self.place_order([(self.pasta, 2), (self.cake, 1)])
+        self.place_order([(self.cake, 3)])
+        before = self.summary()
+
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.summary(), before)
+
+    def test_order_totals_cannot_be_edited(self):
+        order_id = self.place_order([(self.pasta, 1)])
+        response = self.manager_client.patch(f'/api/orders/{order_id}/', {'total': 99}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], '12.00')
+
+    def test_cascade_deletes_keep_the_rollups_in_step(self):
+        self.place_order([(self.pasta, 2), (self.cake, 1)])
+        other = User.objects.create_user(username='other')
+        self.customer_client.force_authenticate(user=other)
+        self.place_order([(self.cake, 3)])
+
+        self.cake.delete()
+        after_menuitem = self.summary()
+        self.assertEqual((after_menuitem['orders'], after_menuitem['items']), (2, 2))
+        other.delete()
+        after_user = self.summary()
+        self.assertEqual((after_user['orders'], after_user['items']), (1, 2))
+
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.figures(self.summary()), self.figures(after_user))
+
+    def test_every_delete_subtracts_what_a_rebuild_counts(self):
+        kept = self.place_order([(self.pasta, 2), (self.cake, 1)])
+        edited = self.place_order([(self.pasta, 1)])
+        self.place_order([(self.cake, 3)])
+        # An edit outside the API, reconciled as documented: the total no longer matches the lines
+        Order.objects.filter(pk=edited).update(total=7)
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+
+        self.manager_client.delete(f'/api/orders/{edited}/')
+        # As the admin's bulk delete does
+        Order.objects.exclude(pk=kept).delete()
+        after = self.summary()
+        self.assertEqual((after['orders'], after['items'], after['revenue']), (1, 3, '29.00'))
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.figures(self.summary()), self.figures(after))
+
+    def test_customers_cannot_read_analytics(self):
+        response = self.customer_client.get('/api/analytics/sales')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ReadSerializerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.customer_user = User.objects.create_user(username='customer', password='customerpass')
+        self.category = Category.objects.create(slug='plats', title='Plats du jour\u2028été')
+        self.tart = MenuItem.objects.create(title='Tarte "Tatin"', price=7.5, category=self.category)
+        self.soup = MenuItem.objects.create(title='Soupe', price=3.10, featured=True, category=self.category)
+        Cart.objects.create(user=self.customer_user, menuitem=self.tart, quantity=2, unit_price=7.5, price=15)
+        order = Order.objects.create(user=self.customer_user, total=10.6, status=0)
+        OrderItem.objects.create(order=order, menuitem=self.tart, quantity=1, price=7.5)
+        OrderItem.objects.create(order=order, menuitem=self.soup, quantity=1, price=3.1)
+
+    def assertSameBytes(self, serializer_class, instances):
+        expected = JSONRenderer().render(serializer_class(instances, many=True).data)
+        actual = FastJSONRenderer().render(read_serializer(serializer_class)(instances, many=True).data)
+        self.assertEqual(actual, expected)
+
+    def test_plans_match_the_model_serializers(self):
+        self.assertSameBytes(MenuItemSerializer, MenuItem.objects.select_related('category'))
+        self.assertSameBytes(CategorySerializer, Category.objects.all())
+        self.assertSameBytes(CartSerializer, Cart.objects.select_related('menuitem__category'))
+        self.assertSameBytes(OrderSerializer, Order.objects.prefetch_related('orderitem_set__menuitem__category'))
+
+    def test_renderer_matches_json_renderer(self):
+        data = {'text': 'a\u2028b\u2029c "é"', 'when': date(2024, 1, 2), 'none': None, 'ids': (1, 2)}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4')
+        )
+
+    def test_read_endpoints_are_unchanged(self):
+        client = APIClient()
+        client.force_authenticate(user=self.customer_user)
+        response = client.get('/api/cart/')
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render(CartSerializer(Cart.objects.all(), many=True).data)
+        )
+        response = client.get(f'/api/menu-items/{self.tart.id}/')
+        self.assertEqual(response.content, JSONRenderer().render(MenuItemSerializer(self.tart).data))
+
+    def test_writes_still_use_the_model_serializer(self):
+        manager_user = User.objects.create_user(username='manager', password='managerpass')
+        manager_user.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        client = APIClient()
+        client.force_authenticate(user=manager_user)
+        response = client.post('/api/menu-items/', {
+            'title': 'Gratin', 'price': '9.00', 'category_id': self.category.id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = client.get('/api/menu-items/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        manager_group, _ = Group.objects.get_or_create(name='Manager')
+        crew_group, _ = Group.objects.get_or_create(name='Delivery Crew')
+        self.manager_user = User.objects.create_user(username='manager', password='managerpass')
+        self.manager_user.groups.add(manager_group)
+        self.customer_user = User.objects.create_user(username='customer', password='customerpass')
+        self.crew = [
+            User.objects.create_user(username=f'crew{i}', password='crewpass') for i in range(3)
+        ]
+        crew_group.user_set.add(*self.crew)
+
+        self.manager_client = APIClient()
+        self.manager_client.force_authenticate(user=self.manager_user)
+
+    def create_orders(self, count, **kwargs):
+        return Order.objects.bulk_create(
+            Order(user=self.customer_user, total=10, **kwargs) for _ in range(count)
+        )
+
+    def loads(self):
+        return [
+            Order.objects.filter(delivery_crew=member, status__lt=OrderStatus.DELIVERED).count()
+            for member in self.crew
+        ]
+
+    def test_balances_by_current_load(self):
+        self.create_orders(4, delivery_crew=self.crew[0])
+        self.create_orders(10, delivery_crew=self.crew[1], status=OrderStatus.DELIVERED)
+        self.create_orders(8)
+
+        response = self.manager_client.post('/api/orders/assign/', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['assigned'], 8)
+        self.assertEqual(self.loads(), [4, 4, 4])
+        self.assertEqual([crew['open_orders'] for crew in response.data['crew']], [4, 4, 4])
+
+    def test_one_select_and_one_update_per_batch(self):
+        self.create_orders(25)
+        with CaptureQueriesContext(connection) as context:
+            call_command('dispatch_orders', batch_size=10, stdout=StringIO())
+        statements = [query['sql'].split()[0] for query in context.captured_queries]
+        self.assertEqual(statements.count('UPDATE'), 3)
+        self.assertFalse(Order.objects.filter(delivery_crew__isnull=True).exists())
+
+    def test_limit_and_existing_assignments(self):
+        self.create_orders(6)
+        manual = self.create_orders(1, delivery_crew=self.crew[2])[0]
+
+        response = self.manager_client.post('/api/orders/assign/', {'limit': 2}, format='json')
+        self.assertEqual(response.data['assigned'], 2)
+        self.assertEqual(Order.objects.filter(delivery_crew__isnull=True).count(), 4)
+        manual.refresh_from_db()
+        self.assertEqual(manual.delivery_crew, self.crew[2])
+
+        response = self.manager_client.post('/api/orders/assign/', {'limit': 0}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_orders_taken_meanwhile_are_not_counted(self):
+        taken = self.create_orders(4)[:2]
+        heappop = heapq.heappop
+
+        def assign_elsewhere_first(heap):
+            # Another run claims two orders between the SELECT and the UPDATE
+            if not Order.objects.filter(delivery_crew=self.crew[2]).exists():
+                Order.objects.filter(pk__in=[order.pk for order in taken]).update(delivery_crew=self.crew[2])
+            return heappop(heap)
+
+        with mock.patch('heapq.heappop', side_effect=assign_elsewhere_first):
+            response = self.manager_client.post('/api/orders/assign/', format='json')
+        self.assertEqual(response.data['assigned'], 2)
+        self.assertEqual(
+            [crew['open_orders'] for crew in response.data['crew']], self.loads()
+        )
+
+    def test_only_managers_can_assign(self):
+        client = APIClient()
+        client.force_authenticate(user=self.crew[0])
+        response = client.post('/api/orders/assign/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class DeliveryFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        crew_group, _ = Group.objects.get_or_create(name='Delivery Crew')
+        self.delivery_user = User.objects.create_user(username='delivery', password='deliverypass')
+        self.delivery_user.groups.add(crew_group)
+        self.customer_user = User.objects.create_user(username='customer', password='customerpass')
+        self.order = Order.objects.create(
+            user=self.customer_user, delivery_crew=self.delivery_user, total=20
+        )
+        Order.objects.create(
+            user=self.customer_user, delivery_crew=self.delivery_user, total=5, status=OrderStatus.DELIVERED
+        )
+        self.delivery_token = Token.objects.create(user=self.delivery_user).key
+        self.customer_token = Token.objects.create(user=self.customer_user).key
+
+    async def feed(self, token=None, **params):
+        return await self.async_client.get(
+            '/api/async/delivery/feed/', params,
+            headers={'Authorization': f'Token {token or self.delivery_token}'}
+        )
+
+    async def test_feed_returns_open_orders_and_a_cursor(self):
+        response = await self.feed()
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([order['id'] for order in data['results']], [self.order.id])
+        self.assertEqual(data['cursor'], notifier.cursor(self.delivery_user.pk))
+
+    def test_current_cursor_waits_without_queries(self):
+        cursor = async_to_sync(self.feed)().json()['cursor']
+        with CaptureQueriesContext(connection) as context:
+            response = async_to_sync(self.feed)(since=cursor, wait=0)
+        self.assertEqual(response.status_code, 204)
+        # Token, user and roles all come from the cache
+        self.assertEqual(len(context.captured_queries), 0)
+
+    async def test_long_poll_wakes_on_publish(self):
+        cursor = (await self.feed()).json()['cursor']
+
+        async def publish_soon():
+            await asyncio.sleep(0.05)
+            notifier.publish([self.delivery_user.pk])
+
+        started = time.monotonic()
+        response, _ = await asyncio.gather(self.feed(since=cursor, wait=10), publish_soon())
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertNotEqual(response.json()['cursor'], cursor)
+
+    async def test_stale_cursor_gets_fresh_data(self):
+        response = await self.feed(since='old-1', wait=10)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deliver_and_assignment_publish_on_commit(self):
+        version = notifier.version(self.delivery_user.pk)
+        client = APIClient()
+        client.force_authenticate(user=self.delivery_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.patch(f'/api/orders/{self.order.id}/deliver/')
+        self.assertGreater(notifier.version(self.delivery_user.pk), version)
+
+        version = notifier.version(self.delivery_user.pk)
+        Order.objects.create(user=self.customer_user, total=7)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('dispatch_orders', stdout=StringIO())
+        self.assertGreater(notifier.version(self.delivery_user.pk), version)
+
+    @override_settings(LITTLELEMON_FEED_STREAM_MAX_AGE=0.2, LITTLELEMON_FEED_HEARTBEAT=0.05)
+    async def test_server_sent_events(self):
+        response = await self.async_client.get(
+            '/api/async/delivery/events/',
+            headers={'Authorization': f'Token {self.delivery_token}'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn(f'id: {notifier.cursor(self.delivery_user.pk)}\nevent: orders\n', body)
+        self.assertIn(': keepalive', body)
+
+    async def test_only_delivery_crew(self):
+        response = await self.feed(token=self.customer_token)
+        self.assertEqual(response.status_code, 403)
+
+
+class DatabaseTuningTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_sqlite_connections(self):
+        original = self.pragma('cache_size')
+        try:
+            with override_settings(LITTLELEMON_SQLITE_PRAGMAS={'cache_size': -2048}):
+                apply_sqlite_pragmas(sender=None, connection=connection)
+            self.assertEqual(self.pragma('cache_size'), -2048)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA cache_size = {original}')
+
+    @override_settings(LITTLELEMON_SQLITE_PRAGMAS={'cache_size': '1; DROP TABLE auth_user'})
+    def test_pragma_values_are_validated(self):
+        with self.assertRaises(ValueError):
+            apply_sqlite_pragmas(sender=None, connection=connection)
+
+    def test_reads_of_safe_requests_use_the_read_database(self):
+        router = ReadReplicaRouter()
+        seen = {}
+
+        def view(request):
+            seen[request.method] = router.db_for_read(MenuItem)
+            return HttpResponse()
+
+        middleware = ReadReplicaMiddleware(view)
+        # Any configured alias works; a real setup names a replica here
+        with override_settings(LITTLELEMON_READ_DATABASE='default'):
+            middleware(RequestFactory().get('/api/menu-items/'))
+            middleware(RequestFactory().post('/api/cart/'))
+            self.assertFalse(router.allow_migrate('default', 'LittleLemonAPI'))
+        self.assertEqual(seen, {'GET': 'default', 'POST': None})
+        self.assertEqual(router.db_for_write(MenuItem), 'default')
+        self.assertIsNone(router.db_for_read(MenuItem))
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.manager_group = Group.objects.get_or_create(name='Manager')[0]
+        self.user = User.objects.create_user(username='customer', password='customerpass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_skip_the_token_lookup(self):
+        self.client.get('/api/cart/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            [query for query in context.captured_queries if 'authtoken_token' in query['sql']]
+        )
+
+    def test_logout_invalidates_the_cached_token(self):
+        self.client.get('/api/cart/')
+        response = self.client.post('/api/token/logout/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/cart/')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_drops_the_cached_token(self):
+        self.client.get('/api/cart/')
+        self.user.set_password('newpass')
+        self.user.save()
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/cart/')
+        self.assertTrue(
+            [query for query in context.captured_queries if 'authtoken_token' in query['sql']]
+        )
+
+    def test_other_user_saves_keep_the_cached_token(self):
+        self.client.get('/api/cart/')
+        # A login elsewhere saves last_login alone; a profile edit saves everything
+        update_last_login(None, self.user)
+        self.user.first_name = 'Ada'
+        self.user.save()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            [query for query in context.captured_queries if 'authtoken_token' in query['sql']]
+        )
+
+    def test_group_change_refreshes_cached_roles(self):
+        response = self.client.get('/api/orders/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.user.groups.add(self.manager_group)
+        response = self.client.get('/api/orders/export/', {'format': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_async_views_share_the_cache(self):
+        self.client.get('/api/cart/')
+        with CaptureQueriesContext(connection) as context:
+            response = async_to_sync(self.async_client.get)(
+                '/api/async/cart/', headers={'Authorization': f'Token {self.token.key}'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            [query for query in context.captured_queries if 'authtoken_token' in query['sql']]
+        )
+
+
+RATES = {
+    'anon': '2/min',
+    'customer': '5/min',
+    'delivery_crew': '10/min',
+    'manager': '20/min',
+    'cart_write': '2/min',
+}
+
+
+@mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', RATES)
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.manager_group = Group.objects.get_or_create(name='Manager')[0]
+        self.customer_user = User.objects.create_user(username='customer', password='customerpass')
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+        self.category = Category.objects.create(slug='test-category', title='Test Category')
+        self.menuitem = MenuItem.objects.create(title='Lemon Cake', price=5, category=self.category)
+
+    def allowed(self, throttle, user, now):
+        request = RequestFactory().get('/api/menu-items/')
+        request.user = user
+        with mock.patch.object(throttle, 'timer', return_value=now):
+            return throttle.allow_request(request, None)
+
+    def test_bucket_refills_over_time(self):
+        throttle = RoleRateThrottle()
+        self.assertEqual(
+            [self.allowed(throttle, self.customer_user, 1000) for _ in range(6)],
+            [True] * 5 + [False]
+        )
+        # 5/min refills one request every 12 seconds
+        self.assertAlmostEqual(throttle.wait(), 12)
+        self.assertFalse(self.allowed(throttle, self.customer_user, 1011))
+        self.assertTrue(self.allowed(throttle, self.customer_user, 1012))
+
+    def test_state_is_constant_size(self):
+        throttle = RoleRateThrottle()
+        for now in range(3):
+            self.allowed(throttle, self.customer_user, now)
+        self.assertEqual(len(cache.get(throttle.key)), 2)
+
+    def test_rate_follows_the_role(self):
+        self.customer_user.groups.add(self.manager_group)
+        throttle = RoleRateThrottle()
+        results = [self.allowed(throttle, self.customer_user, 0) for _ in range(21)]
+        self.assertEqual(throttle.scope, 'manager')
+        self.assertEqual(results.count(True), 20)
+
+    def test_write_scope_limits_writes_only(self):
+        for _ in range(2):
+            response = self.customer_client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 1})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.customer_client.post('/api/cart/', {'menuitem_id': self.menuitem.id, 'quantity': 1})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response.headers)
+        # Reads only count towards the role rate
+        self.assertEqual(self.customer_client.get('/api/cart/').status_code, status.HTTP_200_OK)
+
+    def test_async_reads_share_the_role_rate(self):
+        headers = {'Authorization': f'Token {Token.objects.create(user=self.customer_user).key}'}
+        for _ in range(3):
+            self.assertEqual(self.customer_client.get('/api/cart/').status_code, status.HTTP_200_OK)
+        for path in ['/api/async/cart/', '/api/async/orders/']:
+            self.assertEqual(self.client.get(path, headers=headers).status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/async/menu-items/', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response.headers)
+        self.assertTrue(response.json()['detail'].startswith('Request was throttled.'))
+
+
+class CatalogMapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.customer_user = User.objects.create_user(username='customer', password='customerpass')
+        self.category = Category.objects.create(slug='test-category', title='Test Category')
+        self.salad = MenuItem.objects.create(title='Salad', price=4.50, category=self.category)
+        self.soup = MenuItem.objects.create(title='Soup', price=3.10, category=self.category)
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+
+    def add(self, menuitem, quantity=1):
+        return self.customer_client.post(
+            '/api/cart/', {'menuitem_id': menuitem.id, 'quantity': quantity}, format='json'
+        )
+
+    def test_cart_list_is_a_single_cart_query(self):
+        self.add(self.salad, 2)
+        self.add(self.soup)
+        with CaptureQueriesContext(connection) as context:
+            response = self.customer_client.get('/api/cart/')
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render(CartSerializer(Cart.objects.order_by('id'), many=True).data)
+        )
+
+    def test_add_uses_the_cached_price(self):
+        self.add(self.soup)
+        with CaptureQueriesContext(connection) as context:
+            response = self.add(self.salad, 2)
+        self.assertEqual(response.data['price'], '9.00')
+        self.assertFalse(
+            [query for query in context.captured_queries if 'littlelemonapi_menuitem' in query['sql']]
+        )
+
+    def test_change_from_another_process_is_picked_up(self):
+        self.add(self.salad)
+        # Bypasses the signals, as a write from another worker would
+        MenuItem.objects.filter(pk=self.salad.pk).update(price=6, title='Big Salad')
+        CatalogVersion.objects.update(version=F('version') + 1)
+
+        response = self.add(self.soup)
+        self.assertEqual(response.data['price'], '3.10')
+        response = self.add(self.salad)
+        self.assertEqual(response.data['quantity'], 2)
+        self.assertEqual(response.data['price'], '12.00')
+        response = self.customer_client.get('/api/cart/')
+        self.assertEqual(
+            [(line['menuitem']['title'], line['price']) for line in response.data],
+            [('Big Salad', '12.00'), ('Soup', '3.10')]
+        )
+
+    def test_cart_keeps_the_price_it_was_added_at(self):
+        self.add(self.salad)
+        self.salad.price = 5
+        self.salad.save()
+        response = self.customer_client.get('/api/cart/')
+        self.assertEqual(response.data[0]['menuitem']['price'], '5.00')
+        self.assertEqual(response.data[0]['price'], '4.50')
+
+
+class OrderLifecycleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        manager_group = Group.objects.get_or_create(name='Manager')[0]
+        crew_group = Group.objects.get_or_create(name='Delivery Crew')[0]
+        self.manager_user = User.objects.create_user(username='manager', password='managerpass')
+        self.manager_user.groups.add(manager_group)
+        self.delivery_user = User.objects.create_user(username='delivery', password='deliverypass')
+        self.delivery_user.groups.add(crew_group)
+        self.customer_user = User.objects.create_user(username='customer', password='customerpass')
+        self.orders = Order.objects.bulk_create(
+            Order(user=self.customer_user, delivery_crew=self.delivery_user, total=10) for _ in range(5)
+        )
+        self.ids = [order.id for order in self.orders]
+
+        self.manager_client = APIClient()
+        self.manager_client.force_authenticate(user=self.manager_user)
+        self.delivery_client = APIClient()
+        self.delivery_client.force_authenticate(user=self.delivery_user)
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+
+    def transition(self, client, ids, target):
+        return client.post('/api/orders/transition/', {'ids': ids, 'status': target}, format='json')
+
+    def statuses(self):
+        return list(Order.objects.order_by('id').values_list('status', flat=True))
+
+    def test_bulk_transition_is_one_update(self):
+        Order.objects.filter(pk=self.ids[0]).update(status=OrderStatus.DELIVERED)
+        with CaptureQueriesContext(connection) as context:
+            response = self.transition(self.manager_client, self.ids + [9999], OrderStatus.PREPARING)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], self.ids[1:])
+        self.assertEqual(response.data['rejected'], [self.ids[0], 9999])
+        updates = [query for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.statuses(), [OrderStatus.DELIVERED] + [OrderStatus.PREPARING] * 4)
+
+    def test_orders_never_move_back(self):
+        self.transition(self.manager_client, self.ids, OrderStatus.OUT_FOR_DELIVERY)
+        response = self.transition(self.manager_client, self.ids, OrderStatus.PREPARING)
+        self.assertEqual(response.data['updated'], [])
+        response = self.manager_client.patch(
+            f'/api/orders/{self.ids[0]}/', {'status': OrderStatus.PLACED}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(self.statuses()), {OrderStatus.OUT_FOR_DELIVERY})
+
+    def test_crew_may_only_advance_their_own_deliveries(self):
+        response = self.transition(self.delivery_client, self.ids, OrderStatus.PREPARING)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        other = Order.objects.create(user=self.customer_user, total=10)
+        response = self.transition(self.delivery_client, [self.ids[0], other.id], OrderStatus.DELIVERED)
+        self.assertEqual(response.data['updated'], [self.ids[0]])
+        self.assertEqual(response.data['rejected'], [other.id])
+
+        response = self.transition(self.customer_client, self.ids, OrderStatus.DELIVERED)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_crew_patch_follows_the_transition_rules(self):
+        response = self.delivery_client.patch(
+            f'/api/orders/{self.ids[0]}/', {'status': OrderStatus.PREPARING}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.delivery_client.patch(
+            f'/api/orders/{self.ids[1]}/', {'status': OrderStatus.OUT_FOR_DELIVERY}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.statuses()[:2], [OrderStatus.PLACED, OrderStatus.OUT_FOR_DELIVERY])
+
+    def test_invalid_requests_are_rejected(self):
+        for body in [{'ids': [], 'status': 1}, {'ids': self.ids, 'status': 7}, {'status': 1}]:
+            response = self.manager_client.post('/api/orders/transition/', body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deliver_is_a_conditional_update(self):
+        response = self.delivery_client.patch(f'/api/orders/{self.ids[0]}/deliver/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Order.objects.get(pk=self.ids[0]).status, OrderStatus.DELIVERED)
+        # Delivering again is a no-op; someone else's order is not found
+        response = self.delivery_client.patch(f'/api/orders/{self.ids[0]}/deliver/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        other = Order.objects.create(user=self.customer_user, total=10)
+        response = self.delivery_client.patch(f'/api/orders/{other.id}/deliver/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.customer_user = User.objects.create_user(username='customer', password='customerpass')
+        self.category = Category.objects.create(slug='test-category', title='Test Category')
+        self.salad = MenuItem.objects.create(title='Salad', price=4.50, category=self.category)
+        old = date.today() - timedelta(days=800)
+        self.old_orders = [self.create_order(old, OrderStatus.DELIVERED) for _ in range(3)]
+        self.old_open = self.create_order(old, OrderStatus.OUT_FOR_DELIVERY)
+        self.recent = self.create_order(date.today(), OrderStatus.DELIVERED)
+
+    def create_order(self, day, status):
+        order = Order.objects.create(user=self.customer_user, total=9, status=status)
+        # date is auto_now_add
+        Order.objects.filter(pk=order.pk).update(date=day)
+        OrderItem.objects.create(order=order, menuitem=self.salad, quantity=2, price=9)
+        return order
+
+    def test_old_delivered_orders_move_to_the_archive_in_batches(self):
+        DailySales.objects.create(date=date.today(), orders=5)
+        output = StringIO()
+        call_command('apply_retention', '--batch-size', '2', stdout=output)
+        self.assertIn('Archived 3 order(s).', output.getvalue())
+        self.assertEqual(
+            set(Order.objects.values_list('id', flat=True)), {self.old_open.id, self.recent.id}
+        )
+        self.assertEqual(OrderItem.objects.count(), 2)
+        archived = ArchivedOrder.objects.get(pk=self.old_orders[0].pk)
+        self.assertEqual(archived.user_id, self.customer_user.id)
+        self.assertEqual(archived.items, [[self.salad.id, 2, '9.00']])
+        # Rollups keep counting archived orders
+        self.assertEqual(DailySales.objects.get().orders, 5)
+
+    def test_ndjson_archive(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('apply_retention', '--ndjson', directory, stdout=StringIO())
+            [name] = os.listdir(directory)
+            with open(os.path.join(directory, name)) as handle:
+                rows = [json.loads(line) for line in handle]
+        self.assertEqual([row['id'] for row in rows], [order.id for order in self.old_orders])
+        self.assertEqual(rows[0]['items'], [[self.salad.id, 2, '9.00']])
+        self.assertFalse(ArchivedOrder.objects.exists())
+
+    def test_idle_carts_are_purged(self):
+        client = APIClient()
+        client.force_authenticate(user=self.customer_user)
+        client.post('/api/cart/', {'menuitem_id': self.salad.id, 'quantity': 1}, format='json')
+        Cart.objects.update(updated=timezone.now() - timedelta(days=31))
+        # Adding to an existing line counts as activity
+        client.post('/api/cart/', {'menuitem_id': self.salad.id, 'quantity': 1}, format='json')
+        call_command('apply_retention', stdout=StringIO())
+        self.assertEqual(Cart.objects.count(), 1)
+
+        Cart.objects.update(updated=timezone.now() - timedelta(days=31))
+        output = StringIO()
+        call_command('apply_retention', stdout=output)
+        self.assertIn('Purged 1 idle cart line(s).', output.getvalue())
+        self.assertFalse(Cart.objects.exists())
+
+    def test_rebuilding_archived_days_is_refused(self):
+        call_command('apply_retention', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('rebuild_sales_rollups', stdout=StringIO())
+        call_command('rebuild_sales_rollups', '--start', str(date.today()), stdout=StringIO())
+
+    def test_rebuilding_days_archived_to_ndjson_is_refused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('apply_retention', '--ndjson', directory, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, str(date.today() - timedelta(days=800))):
+            call_command('rebuild_sales_rollups', stdout=StringIO())
+
+
+class MenuSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.customer_user = User.objects.create_user(username='customer', password='customerpass')
+        self.mains = Category.objects.create(slug='mains', title='Mains')
+        self.desserts = Category.objects.create(slug='desserts', title='Desserts')
+        self.fish = MenuItem.objects.create(title='Grilled Fish', price=12, category=self.mains)
+        self.pasta = MenuItem.objects.create(title='Pasta', price=9, category=self.mains, featured=True)
+        self.tart = MenuItem.objects.create(title='Lemon Tart', price=5, category=self.desserts, featured=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.customer_user)
+
+    def test_snapshot_groups_items_by_category(self):
+        response = self.client.get('/api/menu/snapshot')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)
+        self.assertEqual(
+            [(category['slug'], [item['title'] for item in category['items']]) for category in data['categories']],
+            [('mains', ['Grilled Fish', 'Pasta']), ('desserts', ['Lemon Tart'])]
+        )
+        self.assertEqual(
+            data['featured'],
+            json.loads(JSONRenderer().render(MenuItemSerializer([self.pasta, self.tart], many=True).data))
+        )
+
+    def test_snapshot_is_served_with_only_the_version_query(self):
+        self.client.get('/api/menu/snapshot')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/menu/snapshot')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/menu/snapshot', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_catalog_change_rebuilds_the_snapshot(self):
+        etag = self.client.get('/api/menu/snapshot')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fish.featured = True
+            self.fish.save()
+        response = self.client.get('/api/menu/snapshot')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            [item['title'] for item in json.loads(response.content)['featured']],
+            ['Grilled Fish', 'Pasta', 'Lemon Tart']
+        )
+
+    def test_change_committed_by_another_process_is_served(self):
+        self.client.get('/api/menu/snapshot')
+        # Another worker: its on_commit hooks and in-process map are not ours
+        MenuItem.objects.filter(pk=self.tart.pk).update(price=99)
+        CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        data = json.loads(self.client.get('/api/menu/snapshot').content)
+        self.assertEqual(data['featured'][-1]['price'], '99.00')
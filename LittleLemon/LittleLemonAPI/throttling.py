@@ -0,0 +1,91 @@
+"""Token-bucket throttles with constant-size state per client.
+
+DRF's SimpleRateThrottle keeps the timestamp of every request in the
+window and rewrites that list on each call, so a 1000/day rate stores and
+pickles up to 1000 floats per request. A token bucket stores two numbers
+(tokens left, time of the last update) and refills continuously at
+``num_requests / duration``; a full bucket allows the same burst the
+timestamp list does. Like DRF's throttles the read-modify-write is not
+atomic, so concurrent requests may overshoot slightly.
+"""
+from rest_framework.throttling import SimpleRateThrottle
+
+from .roles import DELIVERY_CREW, MANAGER, get_user_roles
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        refill = self.num_requests / self.duration
+        tokens, updated = self.cache.get(self.key, (self.num_requests, now))
+        tokens = min(self.num_requests, tokens + (now - updated) * refill)
+        if tokens < 1:
+            self.wait_time = (1 - tokens) / refill
+            return False
+
+        # An untouched bucket is full again after ``duration``, so it can expire then
+        self.cache.set(self.key, (tokens - 1, now), self.duration)
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class RoleRateThrottle(TokenBucketThrottle):
+    """Rate-limit every request at the rate of the caller's role.
+
+    Scopes (``DEFAULT_THROTTLE_RATES`` keys): ``manager``, ``delivery_crew``,
+    ``customer`` and ``anon`` for unauthenticated clients.
+    """
+
+    def __init__(self):
+        # The scope depends on the request, so the rate is resolved in allow_request
+        pass
+
+    def get_scope(self, request):
+        if not (request.user and request.user.is_authenticated):
+            return 'anon'
+        roles = get_user_roles(request.user)
+        if MANAGER in roles:
+            return 'manager'
+        if DELIVERY_CREW in roles:
+            return 'delivery_crew'
+        return 'customer'
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(request)
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+
+class WriteScopeThrottle(TokenBucketThrottle):
+    """Extra limit on unsafe methods of views that set ``throttle_scope``.
+
+    Unlike DRF's ScopedRateThrottle, reads on the same view are not counted.
+    """
+
+    def __init__(self):
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None)
+        if self.scope is None or request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
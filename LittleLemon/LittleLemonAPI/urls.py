@@ -1,11 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     MenuItemViewSet, 
     CategoryViewSet, 
     CartViewSet, 
     OrderViewSet,
-    UserGroupManagementViewSet
+    UserGroupManagementViewSet,
+    MenuSnapshotView,
+    MetricsView,
+    SalesAnalyticsView
 )
 
 router = DefaultRouter()
@@ -16,6 +20,17 @@ router.register(r'orders', OrderViewSet, basename='order')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('analytics/sales', SalesAnalyticsView.as_view(), name='sales-analytics'),
+    path('menu/snapshot', MenuSnapshotView.as_view(), name='menu-snapshot'),
+    
+    # ASGI-native read paths
+    path('async/menu-items/', async_views.menu_item_list, name='async-menuitem-list'),
+    path('async/menu-items/<int:pk>/', async_views.menu_item_detail, name='async-menuitem-detail'),
+    path('async/cart/', async_views.cart_list, name='async-cart-list'),
+    path('async/orders/', async_views.order_list, name='async-order-list'),
+    path('async/delivery/feed/', async_views.delivery_feed, name='async-delivery-feed'),
+    path('async/delivery/events/', async_views.delivery_events, name='async-delivery-events'),
     
     # User Group Management Endpoints
     path('groups/manager/users', 
@@ -24,4 +39,10 @@ urlpatterns = [
     path('groups/delivery-crew/users', 
          UserGroupManagementViewSet.as_view({'get': 'delivery_crew_users', 'post': 'delivery_crew_users'}), 
          name='delivery-crew-users'),
+    path('groups/manager/users/<int:pk>', 
+         UserGroupManagementViewSet.as_view({'delete': 'remove_from_manager_group'}), 
+         name='manager-users-detail'),
+    path('groups/delivery-crew/users/<int:pk>', 
+         UserGroupManagementViewSet.as_view({'delete': 'remove_from_delivery_crew'}), 
+         name='delivery-crew-users-detail'),
 ]
\ No newline at end of file
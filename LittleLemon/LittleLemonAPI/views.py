@@ -1,25 +1,98 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import UnsupportedMediaType
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 from django.contrib.auth.models import User, Group
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.db.models import Prefetch, Sum
 
-from .models import MenuItem, Category, Cart, Order, OrderItem
+from .analytics import record_order, sales_summary
+from .cart import cart_lines, merge_cart_lines, upsert_cart_lines
+from .catalog import CatalogConditionalMixin, CatalogListCacheMixin, get_menu_snapshot
+from .dispatch import assign_open_orders
+from .instrumentation import registry
+from .lifecycle import CREW_STATUS_MESSAGE, CREW_STATUSES, transition_orders
+from .menu_io import EXPORT_FIELDS, ImportRejected, export_menu_rows, import_menu_rows
+from .models import MenuItem, Category, Cart, Order, OrderItem, OrderStatus
 from .serializers import (
     MenuItemSerializer, 
     CategorySerializer, 
     CartSerializer, 
     OrderSerializer, 
     OrderItemSerializer,
+    OrderTransitionSerializer,
     UserSerializer
 )
+from .notifier import publish_crew_changes
+from .pagination import KeysetPaginationMixin
 from .permissions import IsManagerUser, IsDeliveryCrew, IsCustomerUser
+from .read_serializers import ReadSerializerMixin
+from .renderers import CSVRenderer, NDJSONRenderer
+from .reports import ORDER_EXPORT_FIELDS, date_range, export_order_rows
+from .roles import MANAGER, DELIVERY_CREW, get_user_roles
+from .search import search_menu_items
+from .streaming import iter_upload_rows, streaming_export
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+def filter_menu_items(queryset, params):
+    # Shared by MenuItemViewSet and the async read views
+    queryset = queryset.select_related('category')
+    
+    # Filtering
+    category = params.get('category')
+    if category:
+        queryset = queryset.filter(category__slug=category)
+    
+    # Sorting
+    sort_by = params.get('sort')
+    if sort_by == 'price':
+        queryset = queryset.order_by('price')
+    elif sort_by == '-price':
+        queryset = queryset.order_by('-price')
+    
+    # Search
+    search = params.get('search')
+    if search:
+        queryset = search_menu_items(
+            queryset, search, ranked=sort_by not in ('price', '-price')
+        )
+    
+    # A stable order, so every page path returns the same rows
+    if not queryset.ordered:
+        queryset = queryset.order_by('id')
+    
+    return queryset
+
+def order_lines():
+    # Every nested item, menu item and category of a page of orders
+    return OrderItem.objects.select_related('menuitem__category')
+
+def orders_for(user, roles):
+    # Orders visible to ``user``, shared by OrderViewSet and the async read views
+    if MANAGER in roles:
+        queryset = Order.objects.all()
+    elif DELIVERY_CREW in roles:
+        queryset = Order.objects.filter(delivery_crew=user)
+    else:
+        queryset = Order.objects.filter(user=user)
+    
+    # Load them in one extra query; a stable order keeps pages consistent
+    return queryset.order_by('id').prefetch_related(Prefetch('orderitem_set', queryset=order_lines()))
+
+class MenuItemViewSet(
+    CatalogConditionalMixin,
+    CatalogListCacheMixin,
+    KeysetPaginationMixin,
+    ReadSerializerMixin,
+    viewsets.ModelViewSet
+):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
+    list_cache_params = ('category', 'sort', 'search', 'page', 'pagination', 'cursor')
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -28,79 +101,88 @@ class MenuItemViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated, IsManagerUser]
         return [permission() for permission in permission_classes]
     
-    def get_queryset(self):
-        queryset = MenuItem.objects.all()
-        
-        # Filtering
-        category = self.request.query_params.get('category')
-        if category:
-            queryset = queryset.filter(category__slug=category)
-        
-        # Sorting
-        sort_by = self.request.query_params.get('sort')
-        if sort_by == 'price':
-            queryset = queryset.order_by('price')
-        elif sort_by == '-price':
-            queryset = queryset.order_by('-price')
-        
-        # Search
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | 
-                Q(category__title__icontains=search)
+    def normalize_list_params(self, request):
+        params = super().normalize_list_params(request)
+        # Values get_queryset ignores must not fragment the cache
+        if params['sort'] not in ('price', '-price'):
+            params['sort'] = ''
+        if not params['page']:
+            params['page'] = '1'
+        return params
+    
+    def get_keyset_ordering(self):
+        if self.request.query_params.get('sort') == '-price':
+            return ('-price', '-id')
+        return ('price', 'id')
+    
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        return Response(self.get_list_cache_stats())
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_items(self, request):
+        rows = iter_upload_rows(request)
+        if rows is None:
+            raise UnsupportedMediaType(
+                request.content_type, 
+                detail='Upload the menu as text/csv or application/x-ndjson.'
             )
-        
-        return queryset
+        try:
+            counts = import_menu_rows(rows)
+        except ImportRejected as exc:
+            return Response({'rows': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        code = status.HTTP_201_CREATED if counts['created'] else status.HTTP_200_OK
+        return Response(counts, status=code)
+    
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        return streaming_export(request, EXPORT_FIELDS, export_menu_rows(), 'menu')
+    
+    def get_queryset(self):
+        return filter_menu_items(MenuItem.objects.all(), self.request.query_params)
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CatalogConditionalMixin, ReadSerializerMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated, IsManagerUser]
 
 class CartViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated, IsCustomerUser]
+    throttle_scope = 'cart_write'
     
     def list(self, request):
-        cart_items = Cart.objects.filter(user=request.user)
-        serializer = CartSerializer(cart_items, many=True)
-        return Response(serializer.data)
+        return Response(cart_lines(request.user))
     
     def create(self, request):
-        serializer = CartSerializer(data=request.data)
+        # A single line, or a list of lines to sync a whole basket at once
+        many = isinstance(request.data, list)
+        if many:
+            serializer = CartSerializer(data=request.data, many=True, allow_empty=False)
+        else:
+            serializer = CartSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        menuitem_id = serializer.validated_data['menuitem_id']
-        quantity = serializer.validated_data['quantity']
-        menuitem = get_object_or_404(MenuItem, pk=menuitem_id)
-        
-        cart_item, created = Cart.objects.get_or_create(
-            user=request.user, 
-            menuitem=menuitem,
-            defaults={
-                'quantity': quantity,
-                'unit_price': menuitem.price,
-                'price': menuitem.price * quantity
-            }
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.price = menuitem.price * cart_item.quantity
-            cart_item.save()
+        lines = serializer.validated_data if many else [serializer.validated_data]
+        quantities = merge_cart_lines(lines)
+        with transaction.atomic():
+            cart_items = upsert_cart_lines(request.user, quantities)
         
-        return Response(CartSerializer(cart_item).data, status=status.HTTP_201_CREATED)
+        data = cart_items if many else cart_items[0]
+        return Response(data, status=status.HTTP_201_CREATED)
     
     def delete(self, request):
         Cart.objects.filter(user=request.user).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(KeysetPaginationMixin, ReadSerializerMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    keyset_ordering = ('-date', '-id')
+    throttle_scope = 'order_write'
+    lookup_value_regex = r'\d+'
     
     def get_permissions(self):
-        if self.action == 'list':
+        if self.action in ['list', 'retrieve']:
             permission_classes = [IsAuthenticated]
         elif self.action == 'create':
             permission_classes = [IsAuthenticated, IsCustomerUser]
@@ -108,48 +190,111 @@ class OrderViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated, IsManagerUser | IsDeliveryCrew]
         elif self.action == 'destroy':
             permission_classes = [IsAuthenticated, IsManagerUser]
+        else:
+            # Extra actions declare their own permission_classes
+            return super().get_permissions()
         return [permission() for permission in permission_classes]
     
     def get_queryset(self):
         user = self.request.user
-        if user.groups.filter(name='Manager').exists():
-            return Order.objects.all()
-        elif user.groups.filter(name='Delivery Crew').exists():
-            return Order.objects.filter(delivery_crew=user)
-        return Order.objects.filter(user=user)
+        return orders_for(user, get_user_roles(user))
     
     def create(self, request):
         cart_items = Cart.objects.filter(user=request.user)
         
-        if not cart_items:
-            return Response({"detail": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        total = sum(item.price for item in cart_items)
-        
-        order = Order.objects.create(
-            user=request.user, 
-            total=total, 
-            status=0
-        )
-        
-        for cart_item in cart_items:
-            OrderItem.objects.create(
-                order=order, 
-                menuitem=cart_item.menuitem, 
-                quantity=cart_item.quantity,
-                price=cart_item.price
+        with transaction.atomic():
+            total = cart_items.aggregate(total=Sum('price'))['total']
+            if total is None:
+                return Response({"detail": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
+            
+            order = Order.objects.create(
+                user=request.user, 
+                total=total, 
+                status=OrderStatus.PLACED
             )
+            
+            lines = list(cart_items.values_list(
+                'menuitem_id', 'menuitem__category_id', 'quantity', 'price'
+            ))
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order, 
+                    menuitem_id=menuitem_id, 
+                    quantity=quantity,
+                    price=price
+                )
+                for menuitem_id, _, quantity, price in lines
+            ])
+            record_order(order.date, lines)
+            
+            cart_items.delete()
         
-        cart_items.delete()
-        
+        order = self.get_queryset().get(pk=order.pk)
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
     
+    @transaction.atomic
+    def perform_update(self, serializer):
+        previous_crew = serializer.instance.delivery_crew_id
+        order = serializer.save()
+        publish_crew_changes(previous_crew, order.delivery_crew_id)
+    
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # The rollups are updated by the pre_delete receiver in signals.py
+        publish_crew_changes(instance.delivery_crew_id)
+        instance.delete()
+    
     @action(detail=True, methods=['patch'], permission_classes=[IsAuthenticated, IsDeliveryCrew])
     def deliver(self, request, pk=None):
-        order = self.get_object()
-        order.status = 1  # Mark as delivered
-        order.save()
+        orders = self.get_queryset().prefetch_related(None).filter(pk=pk)
+        # A conditional UPDATE; delivering twice is a no-op
+        if not transition_orders(orders, OrderStatus.DELIVERED) and not orders.exists():
+            raise Http404
         return Response({"status": "Order delivered"}, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsManagerUser | IsDeliveryCrew])
+    def transition(self, request):
+        serializer = OrderTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids, target = serializer.validated_data['ids'], serializer.validated_data['status']
+        
+        roles = get_user_roles(request.user)
+        if MANAGER not in roles and target not in CREW_STATUSES:
+            self.permission_denied(request, message=CREW_STATUS_MESSAGE)
+        
+        orders = orders_for(request.user, roles).prefetch_related(None).filter(pk__in=ids)
+        moved = set(transition_orders(orders, target))
+        ids = list(dict.fromkeys(ids))
+        return Response({
+            'status': target, 
+            'updated': [order_id for order_id in ids if order_id in moved], 
+            'rejected': [order_id for order_id in ids if order_id not in moved]
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsManagerUser])
+    def assign(self, request):
+        limit = request.data.get('limit')
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                limit = 0
+            if limit < 1:
+                return Response(
+                    {"limit": ["A positive integer is required."]}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        return Response(assign_open_orders(limit=limit), status=status.HTTP_200_OK)
+    
+    @action(
+        detail=False, 
+        methods=['get'], 
+        permission_classes=[IsAuthenticated, IsManagerUser], 
+        renderer_classes=[CSVRenderer, NDJSONRenderer]
+    )
+    def export(self, request):
+        start, end = date_range(request.query_params)
+        return streaming_export(request, ORDER_EXPORT_FIELDS, export_order_rows(start, end), 'orders')
 
 class UserGroupManagementViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated, IsManagerUser]
@@ -192,4 +337,33 @@ class UserGroupManagementViewSet(viewsets.ViewSet):
         user = get_object_or_404(User, pk=pk)
         delivery_group = Group.objects.get(name='Delivery Crew')
         user.groups.remove(delivery_group)
-        return Response(status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(status=status.HTTP_200_OK)
+
+class MetricsView(APIView):
+    permission_classes = [IsAuthenticated, IsManagerUser]
+    
+    def get(self, request):
+        return HttpResponse(
+            registry.render_prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+class SalesAnalyticsView(APIView):
+    permission_classes = [IsAuthenticated, IsManagerUser]
+    
+    def get(self, request):
+        start, end = date_range(request.query_params)
+        return Response(sales_summary(start, end))
+
+class MenuSnapshotView(APIView):
+    """Categories with their menu items, plus the featured items, in one prebuilt response."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        etag, body = get_menu_snapshot()
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response